@@ -0,0 +1,77 @@
+# bench_agc.py
+# Compara el coste de CPU por chunk entre la normalización pydub y el AGC con NumPy.
+# Uso: python benchmarks/bench_agc.py [--chunks 2000] [--chunk-size 1024]
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio_gain import AutomaticGainControl
+
+
+def synthetic_chunks(n_chunks, chunk_size, rate=16000):
+    # Alterna tramos de "voz" (tono modulado con ruido) y silencio de cabina
+    rng = np.random.default_rng(0)
+    chunks = []
+    t = np.arange(chunk_size) / rate
+    for i in range(n_chunks):
+        if (i // 20) % 2 == 0:
+            signal = 4000 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+            signal += rng.normal(0, 300, chunk_size)
+        else:
+            signal = rng.normal(0, 40, chunk_size)
+        chunks.append(np.clip(signal, -32768, 32767).astype(np.int16).tobytes())
+    return chunks
+
+
+def bench(name, fn, chunks):
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    for chunk in chunks:
+        fn(chunk)
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    # Memoria en una segunda pasada: tracemalloc encarece cada asignación y falsearía los tiempos
+    tracemalloc.start()
+    for chunk in chunks:
+        fn(chunk)
+    _, peak_mem = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(chunks)
+    print(f"{name:8s} cpu/chunk={cpu / n * 1e6:9.1f} us  wall/chunk={wall / n * 1e6:9.1f} us  pico_mem={peak_mem / 1024:8.1f} KiB")
+    return cpu / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks, args.chunk_size)
+
+    agc = AutomaticGainControl()
+    agc_cost = bench("agc", agc.process, chunks)
+
+    try:
+        from pydub import AudioSegment
+        from pydub.effects import normalize
+    except ImportError:
+        print("pydub no está instalado; se omite la comparación.")
+        return
+
+    def pydub_process(chunk):
+        segment = AudioSegment(data=chunk, sample_width=2, frame_rate=16000, channels=1)
+        return normalize(segment).raw_data
+
+    pydub_cost = bench("pydub", pydub_process, chunks)
+    print(f"Aceleración: {pydub_cost / agc_cost:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench_can_receptor.py
+# Inyecta tramas J1939 en el bus 'virtual' a un ritmo fijo y mide si el receptor lo sostiene:
+# cola pendiente en el BufferedReader y retraso entre el envío y el procesado de cada trama.
+# El bus 'virtual' sólo existe dentro del proceso, así que el productor es un hilo con calendario
+# absoluto: si el receptor no da abasto, se ve en la cola y en el retraso, no en tramas perdidas.
+# Uso: python benchmarks/bench_can_receptor.py [--rate 10000] [--seconds 5]
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import can
+
+from can_receptor import CanReceptor
+
+FRAMES = [
+    (0x18FEE200, [0x01] + [0x00] * 7),
+    (0x18FEF157, [0x05] + [0x00] * 7),
+    (0x18FEFC00, [0xFF, 0xC8] + [0xFF] * 6),  # Dash Display: combustible al 80 %
+    (0x18FEF200, [0x01] + [0x00] * 7),
+    (0x0CF00400, [0x00] * 8),  # EEC1: no se decodifica, debe quedar filtrada
+]
+
+
+def produce(rate, seconds, sent):
+    bus = can.interface.Bus(interface='virtual')
+    messages = [can.Message(arbitration_id=i, data=d, is_extended_id=True) for i, d in FRAMES]
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    n = 0
+    while n < total:
+        # Cada trama sale en su instante del calendario (n / rate); nunca se adelanta
+        due = start + n / rate
+        now = time.perf_counter()
+        if now < due:
+            time.sleep(min(due - now, 0.001))
+            continue
+        bus.send(messages[n % len(messages)])
+        n += 1
+    sent.append((n, time.perf_counter() - start))
+    bus.shutdown()
+
+
+def sample_backlog(receptor, done, backlog, interval=0.001):
+    # Tramas en el BufferedReader aún sin procesar, más las que el Notifier no ha recogido del bus
+    while not done.is_set():
+        backlog.append(receptor.reader.buffer.qsize() + receptor.bus.queue.qsize())
+        time.sleep(interval)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    receptor = CanReceptor()
+    receptor.start()
+
+    # Retraso de recepción: desde que el bus virtual sella la trama hasta que el receptor la saca de la cola
+    lags = []
+    get_message = receptor.reader.get_message
+
+    def timed_get_message(timeout=0.5):
+        message = get_message(timeout)
+        if message is not None:
+            lags.append(time.time() - message.timestamp)
+        return message
+
+    receptor.reader.get_message = timed_get_message
+
+    sent = []
+    backlog = []
+    done = threading.Event()
+    producer = threading.Thread(target=produce, args=(args.rate, args.seconds, sent))
+    sampler = threading.Thread(target=sample_backlog, args=(receptor, done, backlog), daemon=True)
+    sampler.start()
+    producer.start()
+    while producer.is_alive():
+        receptor.process_batch(timeout=0.1)
+    producer.join()
+    drain_start = time.perf_counter()
+    while receptor.process_batch(timeout=0.5):
+        pass
+    # Lo que quedaba por procesar al terminar el envío (sin el último timeout de espera)
+    drain = max(0.0, time.perf_counter() - drain_start - 0.5)
+    done.set()
+    sampler.join()
+    receptor.close()
+
+    count, send_time = sent[0]
+    stats = receptor.get_stats()
+    expected = sum(1 for i in range(count) if FRAMES[i % len(FRAMES)][0] != 0x0CF00400)
+    lags.sort()
+    print(f"objetivo={args.rate} tramas/s enviadas={count} tasa_envío={count / send_time:.0f} tramas/s "
+          f"esperadas_tras_filtro={expected} procesadas={stats['frames']}")
+    print(f"cola: media={sum(backlog) / len(backlog):.1f} máx={max(backlog)} tramas | "
+          f"retraso: p50={percentile(lags, 0.5) * 1000:.2f} ms p99={percentile(lags, 0.99) * 1000:.2f} ms "
+          f"máx={lags[-1] * 1000 if lags else 0.0:.2f} ms | vaciado tras el envío={drain * 1000:.0f} ms | "
+          f"decodificación={stats['decode_us']} us/trama")
+
+
+if __name__ == "__main__":
+    main()
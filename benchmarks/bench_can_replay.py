@@ -0,0 +1,133 @@
+# bench_can_replay.py
+# Genera un registro CAN sintético, comprueba la fidelidad temporal de la reproducción a 1x y
+# usa la reproducción a velocidad máxima como carga repetible para CanReceptor (tasa y pérdidas).
+# Uso: python benchmarks/bench_can_replay.py [--rate 2000] [--seconds 5] [--log /tmp/bench.dvcan]
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import can
+
+from can_log import CanLogReader, CanLogWriter, CanReplayer
+from can_receptor import CanReceptor
+
+FRAMES = [
+    (0x18FEE200, [0x01] + [0x00] * 7),
+    (0x18FEF157, [0x05] + [0x00] * 7),
+    (0x18FEFC00, [0xFF, 0xC8] + [0xFF] * 6),  # Dash Display: combustible al 80 %
+    (0x18FEF200, [0x01] + [0x00] * 7),
+]
+
+
+def write_log(path, rate, seconds):
+    writer = CanLogWriter(path)
+    start = time.time()
+    for i in range(int(rate * seconds)):
+        arbitration_id, data = FRAMES[i % len(FRAMES)]
+        writer.write(can.Message(timestamp=start + i / rate, arbitration_id=arbitration_id, data=data,
+                                 is_extended_id=True))
+    writer.close()
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def timing_fidelity(reader):
+    # Se compara el espaciado de las tramas recibidas con el grabado
+    listener = can.interface.Bus(interface='virtual')
+    replayer = CanReplayer(reader, speed=1.0)
+    received = []
+    done = threading.Event()
+
+    def listen():
+        while not done.is_set() or len(received) < reader.records:
+            msg = listener.recv(0.1)
+            if msg is None:
+                if done.is_set():
+                    break
+                continue
+            received.append(msg.timestamp)
+
+    thread = threading.Thread(target=listen)
+    thread.start()
+    elapsed = replayer.run()
+    done.set()
+    thread.join()
+    replayer.close()
+    listener.shutdown()
+
+    recorded = [record[0] for record in reader.iter_records()]
+    errors = sorted(abs((r - received[0]) - (t - recorded[0])) for r, t in zip(received, recorded))
+    return {
+        "frames": len(received),
+        "elapsed_s": round(elapsed, 3),
+        "recorded_s": round(reader.duration, 3),
+        "error_p50_us": round(percentile(errors, 0.5) * 1e6, 1),
+        "error_p99_us": round(percentile(errors, 0.99) * 1e6, 1),
+        "error_max_us": round(errors[-1] * 1e6, 1),
+    }
+
+
+def receptor_load(reader, speed):
+    receptor = CanReceptor()
+    receptor.start()
+    replayer = CanReplayer(reader, speed=speed)
+    result = {}
+
+    def replay():
+        result["elapsed"] = replayer.run()
+
+    producer = threading.Thread(target=replay)
+    producer.start()
+    while producer.is_alive():
+        receptor.process_batch(timeout=0.1)
+    while receptor.process_batch(timeout=0.5):
+        pass
+    producer.join()
+    replayer.close()
+    receptor.close()
+    stats = receptor.get_stats()
+    return {
+        "speed": speed or "max",
+        "sent": replayer.sent,
+        "received": stats["frames"],
+        "dropped": replayer.sent - stats["frames"],
+        "frames_per_s": round(replayer.sent / result["elapsed"]),
+        "decode_us": stats["decode_us"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--speeds", type=float, nargs="+", default=[10.0, 0.0])
+    parser.add_argument("--log", help="Registro a usar; si no se indica se genera uno sintético")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    path = args.log
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_can_"), "sintetico.dvcan")
+        write_log(path, args.rate, args.seconds)
+    reader = CanLogReader(path)
+
+    start = time.perf_counter()
+    count = sum(1 for _ in reader.iter_records())
+    read_s = time.perf_counter() - start
+    print(f"Lectura mmap: {count} registros en {read_s * 1000:.1f} ms ({count / read_s:.0f} registros/s)")
+    print(f"Reproducción 1x: {timing_fidelity(reader)}")
+    for speed in args.speeds:
+        print(f"Carga para CanReceptor: {receptor_load(reader, speed)}")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# bench_can_sender.py
+# Tramas por segundo en el bus 'virtual': un bus por comando (modo anterior) frente a CanSenderService.
+# Uso: python benchmarks/bench_can_sender.py [--frames 5000]
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import can
+
+from can_sender import CanSender
+from can_service import CanSenderService
+
+
+def drain(receiver):
+    count = 0
+    while receiver.recv(timeout=0.2) is not None:
+        count += 1
+    return count
+
+
+def per_command_bus(frames):
+    arbitration_id, data = CanSender.lights_frame(True, False)
+    for _ in range(frames):
+        bus = can.interface.Bus(interface='virtual')
+        try:
+            bus.send(can.Message(arbitration_id=arbitration_id, data=data, is_extended_id=True))
+        finally:
+            bus.shutdown()
+
+
+def pooled_service(frames):
+    service = CanSenderService(interface='virtual')
+    arbitration_id, data = CanSender.lights_frame(True, False)
+    futures = []
+    for _ in range(frames):
+        futures.append(service.submit(arbitration_id, data, block=True))
+    for future in futures:
+        future.result()
+    service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=5000)
+    args = parser.parse_args()
+    # El registro por trama del servicio distorsionaría la medida
+    logging.disable(logging.INFO)
+
+    for name, fn in (("bus por comando", per_command_bus), ("servicio", pooled_service)):
+        receiver = can.interface.Bus(interface='virtual')
+        start = time.perf_counter()
+        fn(args.frames)
+        elapsed = time.perf_counter() - start
+        received = drain(receiver)
+        receiver.shutdown()
+        print(f"{name:16s} {args.frames / elapsed:10.0f} tramas/s  recibidas={received}/{args.frames}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# bench_end_to_end.py
+# Latencia de extremo a extremo: fin de la voz en un WAV -> trama en el bus CAN 'virtual'.
+# Recorre AudioStreamHandler (stream simulado), SpeechRecognizer (./model), CommandProcessor y CommandHandler
+# y mide p50/p95/p99 por etapa. Sin micrófono ni pantalla. Un enunciado (palabra clave + comando) por WAV.
+# Uso: python benchmarks/bench_end_to_end.py fixtures/ [otro.wav ...] [--model ./model] [--throughput]
+#      [--repeat 3] [--early-dispatch] [--grammar] [--output resultados.json]
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import can
+
+from audio_sources import WavFileStream
+from can_service import CanSenderService
+from command_handler import CommandHandler
+from command_journal import CommandJournal
+from speech_recognizer import SpeechRecognizer
+from voice_activity import VoiceActivityDetector
+
+STAGES = ["read", "preprocess", "decode", "recognition", "match", "execute", "tx", "bus", "end_to_end"]
+
+
+class Timings:
+    def __init__(self):
+        self.values = {stage: [] for stage in STAGES}
+        self.futures = []
+
+    def add(self, stage, seconds):
+        self.values[stage].append(seconds)
+
+    def timed(self, stage, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+    def summary(self):
+        return {stage: percentiles(values) for stage, values in self.values.items() if values}
+
+
+class TimedRecognizer:
+    # Envuelve el KaldiRecognizer para cronometrar la decodificación sin tocar SpeechRecognizer
+    def __init__(self, recognizer, timings):
+        self._recognizer = recognizer
+        self.AcceptWaveform = timings.timed("decode", recognizer.AcceptWaveform)
+        self.FinalResult = timings.timed("decode", recognizer.FinalResult)
+
+    def __getattr__(self, name):
+        return getattr(self._recognizer, name)
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    n = len(ordered)
+
+    def rank(p):
+        return round(ordered[min(n - 1, int(n * p))] * 1000, 3)
+
+    return {
+        "count": n,
+        "mean_ms": round(sum(ordered) / n * 1000, 3),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def find_fixtures(paths):
+    fixtures = []
+    for path in paths:
+        if os.path.isdir(path):
+            fixtures.extend(sorted(glob.glob(os.path.join(path, "*.wav"))))
+        else:
+            fixtures.append(path)
+    return fixtures
+
+
+def last_voiced_chunk(stream, chunk_size, recognizer):
+    # Misma configuración que el VAD del reconocedor, aplicada fuera de línea sobre el clip
+    reference = recognizer.vad.detector
+    detector = VoiceActivityDetector(energy_threshold=reference.energy_threshold,
+                                     zcr_min=reference.zcr_min, zcr_max=reference.zcr_max)
+    step = chunk_size * 2
+    last = None
+    for index, offset in enumerate(range(0, len(stream.data), step)):
+        if detector.is_speech(stream.data[offset:offset + step]):
+            last = index
+    return last
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def listen(bus, received, stop):
+    # Marca de tiempo de python-can: instante en que la trama se puso en el bus
+    while not stop.is_set():
+        msg = bus.recv(0.05)
+        if msg is not None:
+            received.append(msg)
+
+
+def reset_state(initial_state):
+    CommandHandler.store.update(initial_state)
+
+
+def run_clip(path, recognizer, timings, realtime, initial_state, received):
+    stream = WavFileStream(path, realtime=realtime)
+    handler = recognizer.audio_handler
+    handler.stream = stream
+    handler.agc.reset()
+    recognizer.recognizer.Reset()
+    recognizer.vad.active = False
+    recognizer.vad.detector.reset()
+    recognizer.audio_buffer.clear()
+    reset_state(initial_state)
+
+    finished = []
+    original_finish = recognizer.finish_utterance
+
+    def finish_utterance(text):
+        finished.append((time.time(), text))
+        original_finish(text)
+
+    recognizer.finish_utterance = finish_utterance
+    first_future = len(timings.futures)
+    first_frame = len(received)
+    start = time.perf_counter()
+    try:
+        while not stream.finished:
+            recognizer.process_audio()
+        # Cerrar el enunciado si el silencio final no bastó
+        recognizer.handle_result(recognizer.recognizer.FinalResult())
+    finally:
+        recognizer.finish_utterance = original_finish
+    wall = time.perf_counter() - start
+
+    frames = []
+    for future in timings.futures[first_future:]:
+        try:
+            result = future.result(timeout=1.0)
+        except Exception as e:
+            logging.warning(f"{path}: el comando no se completó: {e}")
+            continue
+        # Las consultas J1939 se resuelven con las señales de la respuesta, no con la trama enviada
+        if hasattr(result, "timestamp"):
+            frames.append(result)
+    deadline = time.time() + 1.0
+    while len(received) - first_frame < len(frames) and time.time() < deadline:
+        time.sleep(0.005)
+    on_bus = received[first_frame:]
+
+    clip = {
+        "fixture": os.path.basename(path),
+        "audio_s": round(stream.duration, 3),
+        "wall_s": round(wall, 3),
+        "texts": [text for _, text in finished if text],
+        "frames": [{"id": hex(msg.arbitration_id), "data": list(msg.data)} for msg in on_bus],
+    }
+
+    last = last_voiced_chunk(stream, handler.chunk_size, recognizer)
+    if last is None or last >= len(stream.delivery_times):
+        clip["error"] = "sin voz detectada"
+        return clip, stream.duration, wall
+    speech_end = stream.delivery_times[last]
+    final_times = [t for t, text in finished if text]
+    if final_times:
+        timings.add("recognition", final_times[0] - speech_end)
+    if on_bus:
+        end_to_end = on_bus[0].timestamp - speech_end
+        timings.add("end_to_end", end_to_end)
+        clip["end_to_end_ms"] = round(end_to_end * 1000, 1)
+    # Emparejar por contenido: en el bus también aparecen las solicitudes de las consultas
+    unmatched = list(on_bus)
+    for sent in frames:
+        for seen in unmatched:
+            if seen.arbitration_id == sent.arbitration_id and bytes(seen.data) == bytes(sent.data):
+                timings.add("bus", seen.timestamp - sent.timestamp)
+                unmatched.remove(seen)
+                break
+    return clip, stream.duration, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures", nargs="+", help="Archivos WAV (16 bits, mono) o directorios que los contengan")
+    parser.add_argument("--model", default="./model")
+    parser.add_argument("--throughput", action="store_true",
+                        help="Entregar el audio tan rápido como se consuma, sin ritmo de tiempo real")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--early-dispatch", action="store_true")
+    parser.add_argument("--grammar", action="store_true")
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("--output", default="bench_end_to_end.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    fixtures = find_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error("no se encontraron archivos WAV")
+
+    # Historial en un directorio temporal: el benchmark no toca command_history/
+    history_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    CommandHandler.journal = CommandJournal(history_dir, history_size=CommandHandler.max_history_size)
+    initial_state = CommandHandler.get_state()
+
+    timings = Timings()
+    recognizer = SpeechRecognizer(args.model, vad_enabled=not args.no_vad, grammar_mode=args.grammar,
+                                  early_dispatch=args.early_dispatch,
+                                  audio_stream=WavFileStream(frames=b"", trailing_silence=0.0))
+    handler = recognizer.audio_handler
+    handler.read_stream = timings.timed("read", handler.read_stream)
+    handler.preprocess_audio = timings.timed("preprocess", handler.preprocess_audio)
+    recognizer.recognizer = TimedRecognizer(recognizer.recognizer, timings)
+
+    originals = {name: CommandHandler.__dict__[name] for name in ("get_best_match", "execute_command")}
+    original_execute = CommandHandler.execute_command
+    CommandHandler.get_best_match = staticmethod(timings.timed("match", CommandHandler.get_best_match))
+
+    def execute_command(command):
+        start = time.perf_counter()
+        future = original_execute(command)
+        queued = time.time()
+        timings.add("execute", time.perf_counter() - start)
+        if future is not None:
+            timings.futures.append(future)
+            future.add_done_callback(
+                lambda f: None if f.cancelled() or f.exception() or not hasattr(f.result(), "timestamp")
+                else timings.add("tx", f.result().timestamp - queued))
+        return future
+
+    CommandHandler.execute_command = staticmethod(execute_command)
+
+    # Abrir el servicio de transmisión antes de medir y escuchar el bus como lo haría otra ECU
+    CanSenderService.get()
+    listener = can.interface.Bus(interface='virtual')
+    received = []
+    stop = threading.Event()
+    listener_thread = threading.Thread(target=listen, args=(listener, received, stop), daemon=True)
+    listener_thread.start()
+
+    clips = []
+    audio_total = 0.0
+    wall_total = 0.0
+    try:
+        for _ in range(args.repeat):
+            for path in fixtures:
+                clip, audio_s, wall_s = run_clip(path, recognizer, timings, not args.throughput, initial_state, received)
+                clips.append(clip)
+                audio_total += audio_s
+                wall_total += wall_s
+    finally:
+        for name, attribute in originals.items():
+            setattr(CommandHandler, name, attribute)
+        stop.set()
+        listener_thread.join()
+        listener.shutdown()
+        CanSenderService.shutdown_all()
+        CommandHandler.shutdown()
+
+    results = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "machine": platform.machine()},
+        "config": {
+            "mode": "throughput" if args.throughput else "realtime",
+            "model": args.model,
+            "vad": not args.no_vad,
+            "grammar": args.grammar,
+            "early_dispatch": args.early_dispatch,
+            "chunk_size": handler.chunk_size,
+            "rate": handler.rate,
+            "fixtures": len(fixtures),
+            "repeat": args.repeat,
+        },
+        "throughput": {
+            "audio_s": round(audio_total, 3),
+            "wall_s": round(wall_total, 3),
+            "x_realtime": round(audio_total / wall_total, 2) if wall_total else None,
+        },
+        "stages": timings.summary(),
+        "clips": clips,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(f"{results['config']['mode']}: {len(clips)} clips, {results['throughput']['x_realtime']}x tiempo real")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:>12}: n={stats['count']:<5} p50={stats['p50_ms']:>9} ms  p95={stats['p95_ms']:>9} ms  "
+              f"p99={stats['p99_ms']:>9} ms")
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
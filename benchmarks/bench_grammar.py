@@ -0,0 +1,93 @@
+# bench_grammar.py
+# Compara el reconocimiento de vocabulario abierto con el modo gramática (factor de tiempo real y WER).
+# Cada WAV (16 kHz, mono, 16 bits) necesita un .txt al lado con la transcripción de referencia.
+# Uso: python benchmarks/bench_grammar.py grabaciones/*.wav [--model ./model]
+import argparse
+import os
+import sys
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import vosk
+
+from audio_gain import AutomaticGainControl
+from command_handler import CommandHandler
+from command_processor import CommandProcessor
+from utterance_decoder import UtteranceDecoder
+
+KEYWORDS = CommandProcessor.default_keywords
+
+
+def load_clip(path, chunk_size=1024):
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        duration = wav.getnframes() / rate
+        chunks = []
+        while True:
+            data = wav.readframes(chunk_size)
+            if not data:
+                break
+            chunks.append(data)
+    with open(os.path.splitext(path)[0] + ".txt", encoding="utf-8") as f:
+        reference = f.read().strip().lower()
+    return rate, duration, chunks, reference
+
+
+def word_errors(reference, hypothesis):
+    ref, hyp = reference.split(), hypothesis.split()
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def decode(recognizer, chunks):
+    decoder = UtteranceDecoder(recognizer, agc=AutomaticGainControl())
+    for chunk in chunks:
+        decoder.push(chunk)
+    decoder.finish()
+    return " ".join(decoder.texts), decoder.cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--model", default="./model")
+    args = parser.parse_args()
+
+    model = vosk.Model(args.model)
+    grammar = CommandProcessor.build_grammar(KEYWORDS)
+
+    totals = {mode: {"cpu": 0.0, "errors": 0, "words": 0, "fuzzy": 0} for mode in ("abierto", "gramatica")}
+    audio_seconds = 0.0
+    for path in args.wavs:
+        rate, duration, chunks, reference = load_clip(path)
+        audio_seconds += duration
+        for mode in totals:
+            if mode == "gramatica":
+                recognizer = vosk.KaldiRecognizer(model, rate, grammar)
+            else:
+                recognizer = vosk.KaldiRecognizer(model, rate)
+            text, cpu = decode(recognizer, chunks)
+            errors, words = word_errors(reference, text)
+            command = next((text.split(k, 1)[-1].strip() for k in KEYWORDS if k in text), "")
+            stats = totals[mode]
+            stats["cpu"] += cpu
+            stats["errors"] += errors
+            stats["words"] += words
+            # Transcripciones que no son un comando exacto obligan a la búsqueda difusa
+            stats["fuzzy"] += command not in CommandHandler.commands_list
+            print(f"{os.path.basename(path)} [{mode}] '{text}'")
+
+    for mode, stats in totals.items():
+        rtf = stats["cpu"] / audio_seconds if audio_seconds else 0.0
+        wer = stats["errors"] / stats["words"] if stats["words"] else 0.0
+        print(f"{mode:10s} RTF={rtf:.3f} WER={wer:.1%} búsquedas_difusas={stats['fuzzy']}/{len(args.wavs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_journal.py
+# Amplificación de escritura y tiempo de carga del diario de comandos frente al volcado completo con joblib.
+# Uso: python benchmarks/bench_journal.py [--events 1000000]
+import argparse
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import joblib
+
+from command_journal import CommandJournal
+
+COMMANDS = [
+    "encender luces de cabina", "apagar luces de cabina",
+    "encender luces exteriores", "apagar luces exteriores",
+    "abrir puerta", "cerrar puerta",
+    "consultar nivel de combustible",
+    "encender motor", "apagar motor",
+]
+
+
+def event(i):
+    return COMMANDS[i % len(COMMANDS)], (i // 7) % 24
+
+
+def write_journal(directory, events, segment_events):
+    journal = CommandJournal(directory, segment_events=segment_events)
+    journal.recover()
+    start = time.perf_counter()
+    for i in range(events):
+        journal.append(*event(i))
+    journal.close()
+    return time.perf_counter() - start, journal.bytes_written
+
+
+def load_journal(directory):
+    start = time.perf_counter()
+    counts, recent = CommandJournal(directory).recover()
+    elapsed = time.perf_counter() - start
+    assert len(recent) == 100
+    return elapsed, sum(counts.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    payload = sum(len(f"{h}\t{c}\n".encode()) for c, h in (event(i) for i in range(args.events)))
+
+    # Modo anterior: volcar los últimos 100 comandos con joblib cada 5 comandos
+    history = [event(i) for i in range(100)]
+    buffer = io.BytesIO()
+    joblib.dump({'command_history': [c for c, _ in history], 'time_history': [h for _, h in history]}, buffer)
+    legacy_bytes = buffer.tell() * (args.events // 5)
+    print(f"joblib cada 5 comandos: {legacy_bytes / 1e6:10.1f} MB escritos, amplificación {legacy_bytes / payload:7.1f}x")
+
+    for name, segment_events in (("diario + compactación", 10000), ("diario sin compactar", args.events + 1)):
+        directory = tempfile.mkdtemp()
+        try:
+            elapsed, written = write_journal(directory, args.events, segment_events)
+            load_time, loaded = load_journal(directory)
+            print(f"{name:22s}: {written / 1e6:10.1f} MB escritos, amplificación {written / payload:7.2f}x, "
+                  f"{elapsed / args.events * 1e6:6.2f} us/evento, carga {load_time * 1e3:8.1f} ms ({loaded} eventos)")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
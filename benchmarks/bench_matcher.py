@@ -0,0 +1,91 @@
+# bench_matcher.py
+# Compara fuzzywuzzy.process.extractOne con CommandMatcher al crecer la lista de comandos (9 -> 5000).
+# Uso: python benchmarks/bench_matcher.py [--queries 200]
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fuzzywuzzy import process
+
+from command_matcher import CommandMatcher
+
+BASE_COMMANDS = [
+    "encender luces de cabina", "apagar luces de cabina",
+    "encender luces exteriores", "apagar luces exteriores",
+    "abrir puerta", "cerrar puerta",
+    "consultar nivel de combustible",
+    "encender motor", "apagar motor",
+]
+ACTIONS = ["encender", "apagar", "abrir", "cerrar", "subir", "bajar", "activar", "desactivar", "consultar", "bloquear"]
+DEVICES = ["luces", "puerta", "ventana", "espejo", "asiento", "calefaccion", "ventilador", "limpiaparabrisas",
+           "retrovisor", "maletero", "techo", "radio", "bocina", "faros", "intermitentes", "compresor",
+           "rampa", "toldo", "camara", "sensor", "bomba", "valvula", "freno", "suspension", "remolque"]
+ZONES = ["delantera", "trasera", "izquierda", "derecha", "de cabina", "exterior", "del conductor",
+         "del pasajero", "central", "superior", "inferior", "lateral", "principal", "auxiliar",
+         "de carga", "de emergencia", "norte", "sur", "uno", "dos"]
+
+
+def build_commands(size):
+    commands = list(BASE_COMMANDS)
+    for action, device, zone in itertools.product(ACTIONS, DEVICES, ZONES):
+        if len(commands) >= size:
+            break
+        command = f"{action} {device} {zone}"
+        if command not in commands:
+            commands.append(command)
+    return commands[:size]
+
+
+def noisy(command, rng):
+    # Simula errores de transcripción: letras cambiadas y palabras perdidas
+    words = command.split()
+    if len(words) > 2 and rng.random() < 0.3:
+        words.pop(rng.randrange(len(words)))
+    text = list(" ".join(words))
+    for _ in range(rng.randint(0, 2)):
+        text[rng.randrange(len(text))] = rng.choice("abcdeilmnoprstu")
+    return "".join(text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for size in (9, 50, 500, 1000, 5000):
+        commands = build_commands(size)
+        queries = [noisy(rng.choice(commands), rng) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        expected = [process.extractOne(q, commands) for q in queries]
+        fuzzy_time = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        matcher = CommandMatcher(commands, cache_size=0)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        results = [matcher.extract_one(q) for q in queries]
+        cold_time = (time.perf_counter() - start) / len(queries)
+
+        cached = CommandMatcher(commands)
+        for q in queries:
+            cached.extract_one(q)
+        start = time.perf_counter()
+        for q in queries:
+            cached.extract_one(q)
+        warm_time = (time.perf_counter() - start) / len(queries)
+
+        same_score = sum(r[1] == e[1] for r, e in zip(results, expected)) / len(queries)
+        print(f"n={size:5d} extractOne={fuzzy_time * 1e3:8.3f} ms  indice={cold_time * 1e3:7.3f} ms  "
+              f"cache={warm_time * 1e6:6.1f} us  construccion={build_time * 1e3:7.1f} ms  "
+              f"misma_puntuacion={same_score:.1%}")
+
+
+if __name__ == "__main__":
+    main()
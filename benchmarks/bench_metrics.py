@@ -0,0 +1,62 @@
+# bench_metrics.py
+# Coste de la instrumentación en el camino caliente: sin activar nunca, activada y desactivada de nuevo.
+# Desactivada, los métodos originales vuelven a estar en su sitio, así que el coste debe ser cero.
+# Uso: python benchmarks/bench_metrics.py [--calls 20000] [--repeat 5]
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from command_handler import CommandHandler
+from metrics import Metrics
+
+QUERIES = ["encender luces", "abrir puertas", "apagar motor", "nivel de combustible", "luces de la cabina"]
+
+
+def match():
+    for query in QUERIES:
+        CommandHandler.get_best_match(query)
+
+
+def lock():
+    with CommandHandler.state_lock:
+        pass
+
+
+def measure(calls, repeat):
+    # Mejor de varias repeticiones, en microsegundos por llamada
+    return {
+        "get_best_match": min(timeit.repeat(match, number=calls // len(QUERIES), repeat=repeat)) / calls * 1e6,
+        "state_lock": min(timeit.repeat(lock, number=calls, repeat=repeat)) / calls * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    originals = {name: CommandHandler.__dict__[name] for name in ("get_best_match", "state_lock")}
+    match()  # Construir el índice del matcher antes de medir
+
+    baseline = measure(args.calls, args.repeat)
+    Metrics.enable(log_interval=None)
+    enabled = measure(args.calls, args.repeat)
+    Metrics.disable()
+    disabled = measure(args.calls, args.repeat)
+    restored = all(CommandHandler.__dict__[name] is original for name, original in originals.items())
+
+    print(f"{'':>16} {'base':>9} {'activada':>9} {'desact.':>9}  (us/llamada)")
+    for name in baseline:
+        print(f"{name:>16} {baseline[name]:9.3f} {enabled[name]:9.3f} {disabled[name]:9.3f}")
+    print(f"Atributos originales restaurados: {restored}")
+    print(f"Muestras registradas con la instrumentación activa: {Metrics.log_line()}")
+
+
+if __name__ == "__main__":
+    main()
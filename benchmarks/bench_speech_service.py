@@ -0,0 +1,92 @@
+# bench_speech_service.py
+# Prueba de carga del servicio multisesión: cuántos flujos en tiempo real aguanta por núcleo
+# con un único vosk.Model compartido. Cada sesión reproduce el mismo WAV al ritmo del micrófono.
+# Un nivel se considera en tiempo real si no se descarta audio y el p95 de espera en cola queda bajo --lag-limit.
+# Uso: python benchmarks/bench_speech_service.py grabacion.wav [--model ./model] [--max-streams 64]
+#      [--seconds 20] [--workers N] [--lag-limit 0.5]
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import vosk
+
+from audio_sources import WavFileStream
+from speech_service import SpeechService
+
+
+def run_level(model, path, streams, seconds, workers):
+    service = SpeechService(model=model, workers=workers, recognizer_pool_size=streams)
+    clip = WavFileStream(path, realtime=False)
+    repeat = max(1, int(seconds / clip.duration + 0.999))
+    start = time.perf_counter()
+    sessions = []
+    for _ in range(streams):
+        # Arranques escalonados a lo largo de un clip: los conductores no hablan todos a la vez
+        sessions.append(service.open_session(WavFileStream(path, realtime=True, repeat=repeat),
+                                             on_text=lambda session, text: None))
+        time.sleep(clip.duration / streams)
+    for session in sessions:
+        session.done.wait()
+    wall = time.perf_counter() - start
+    service.shutdown()
+
+    stats = [session.get_stats() for session in sessions]
+    lags = [s["lag_p95_ms"] or 0.0 for s in stats]
+    audio = sum(s["audio_s"] for s in stats)
+    return {
+        "streams": streams,
+        "dropped": sum(s["dropped"] for s in stats),
+        "lag_p95_ms": max(lags),
+        "rtf": round(sum(session.decode_s for session in sessions) / audio, 4) if audio else None,
+        "audio_s": round(audio, 1),
+        "wall_s": round(wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav")
+    parser.add_argument("--model", default="./model")
+    parser.add_argument("--max-streams", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--lag-limit", type=float, default=0.5)
+    parser.add_argument("--output", help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    # Un solo modelo para todos los niveles y sesiones
+    model = vosk.Model(args.model)
+    levels = []
+    best = 0
+    streams = 1
+    while streams <= args.max_streams:
+        result = run_level(model, args.wav, streams, args.seconds, args.workers)
+        result["realtime"] = result["dropped"] == 0 and result["lag_p95_ms"] <= args.lag_limit * 1000
+        levels.append(result)
+        print(f"{streams:4d} flujos: perdidos={result['dropped']:<5} p95 espera={result['lag_p95_ms']:8.1f} ms "
+              f"rtf={result['rtf']} {'OK' if result['realtime'] else 'NO'}")
+        if not result["realtime"]:
+            break
+        best = streams
+        streams *= 2
+
+    summary = {
+        "workers": args.workers,
+        "max_realtime_streams": best,
+        "streams_per_core": round(best / args.workers, 2),
+        "levels": levels,
+    }
+    print(f"Flujos en tiempo real: {best} con {args.workers} workers ({summary['streams_per_core']} por núcleo)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
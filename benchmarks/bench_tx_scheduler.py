@@ -0,0 +1,65 @@
+# bench_tx_scheduler.py
+# Ráfagas de cambios de luces (clics de GUI + voz) enviadas directamente frente a través del TransmitScheduler.
+# Cuenta las tramas que llegan al bus 'virtual' y la latencia hasta que se resuelve cada Future.
+# Uso: python benchmarks/bench_tx_scheduler.py [--changes 2000] [--gap-ms 2]
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import can
+
+from can_sender import CanSender
+from can_service import CanSenderService
+from tx_scheduler import TransmitScheduler
+
+
+def drain(receiver):
+    count = 0
+    while receiver.recv(timeout=0.2) is not None:
+        count += 1
+    return count
+
+
+def burst(target, changes, gap):
+    # Cada cambio alterna luces de cabina y exteriores, como dos fuentes pulsando a la vez
+    futures = []
+    start = time.perf_counter()
+    for i in range(changes):
+        frame = CanSender.lights_frame(exterior=bool(i & 1), interior=bool(i & 2))
+        futures.append((time.time(), target.submit(*frame)))
+        if gap:
+            time.sleep(gap)
+    latencies = []
+    for submitted, future in futures:
+        latencies.append(future.result(timeout=5).timestamp - submitted)
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--changes", type=int, default=2000)
+    parser.add_argument("--gap-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    receiver = can.interface.Bus(interface='virtual')
+    service = CanSenderService.get()
+    for name, target in (("directo", service), ("planificador", TransmitScheduler(service))):
+        elapsed, latencies = burst(target, args.changes, args.gap_ms / 1000)
+        frames = drain(receiver)
+        stats = target.get_stats()
+        print(f"{name:>12}: cambios={args.changes} tramas_en_bus={frames} "
+              f"latencia p50={latencies[len(latencies) // 2] * 1000:.1f} ms "
+              f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms  {stats}")
+        if isinstance(target, TransmitScheduler):
+            target.shutdown()
+    receiver.shutdown()
+    CanSenderService.shutdown_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_vad.py
+# Mide la fracción de audio que el VAD evita enviar a Vosk sobre grabaciones WAV (16 kHz, mono, 16 bits).
+# Con --model compara además la transcripción y el tiempo de CPU con y sin el VAD.
+# Uso: python benchmarks/bench_vad.py grabacion1.wav [grabacion2.wav ...] [--model ./model]
+import argparse
+import os
+import sys
+import wave
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio_gain import AutomaticGainControl
+from voice_activity import VoiceActivityDetector, VoiceActivityGate
+from utterance_decoder import UtteranceDecoder
+
+
+def read_chunks(path, chunk_size):
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: se esperaba audio mono de 16 bits")
+        rate = wav.getframerate()
+        chunks = []
+        while True:
+            data = wav.readframes(chunk_size)
+            if not data:
+                break
+            chunks.append(data)
+    return rate, chunks
+
+
+def transcribe(model, rate, chunks, gate=None):
+    import vosk
+    decoder = UtteranceDecoder(vosk.KaldiRecognizer(model, rate), gate, AutomaticGainControl())
+    for chunk in chunks:
+        decoder.push(chunk)
+    decoder.finish()
+    return " ".join(decoder.texts), decoder.cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--model")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--preroll", type=int, default=4)
+    parser.add_argument("--hangover", type=int, default=8)
+    args = parser.parse_args()
+
+    model = None
+    if args.model:
+        import vosk
+        model = vosk.Model(args.model)
+
+    for path in args.wavs:
+        rate, chunks = read_chunks(path, args.chunk_size)
+        gate = VoiceActivityGate(VoiceActivityDetector(), deque(maxlen=args.preroll), hangover_chunks=args.hangover)
+        for chunk in chunks:
+            gate.push(chunk)
+        line = f"{os.path.basename(path)}: chunks={gate.total_chunks} omitidos={gate.skipped_fraction:.1%}"
+        if model is not None:
+            gate = VoiceActivityGate(VoiceActivityDetector(), deque(maxlen=args.preroll), hangover_chunks=args.hangover)
+            full_text, full_cpu = transcribe(model, rate, chunks)
+            gated_text, gated_cpu = transcribe(model, rate, chunks, gate)
+            saved = 1 - gated_cpu / full_cpu if full_cpu else 0.0
+            line += f" cpu_sin_vad={full_cpu:.3f}s cpu_con_vad={gated_cpu:.3f}s ahorro={saved:.1%}"
+            line += f"\n  sin VAD: '{full_text}'\n  con VAD: '{gated_text}'"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# audio_gain.py
+import numpy as np
+
+class AutomaticGainControl:
+    def __init__(self, target_rms=3000.0, target_peak=29000.0, max_gain=12.0, min_gain=0.25,
+                 attack=0.5, release=0.05, gain_smoothing=0.3, noise_floor=150.0):
+        self.target_rms = target_rms
+        self.target_peak = target_peak
+        self.max_gain = max_gain
+        self.min_gain = min_gain
+        self.attack = attack            # Velocidad de subida de la envolvente
+        self.release = release          # Velocidad de caída de la envolvente
+        self.gain_smoothing = gain_smoothing
+        self.noise_floor = noise_floor  # Por debajo de este RMS no se amplifica (silencio de cabina)
+
+        # Envolvente persistente entre chunks
+        self.rms_envelope = 0.0
+        self.peak_envelope = 0.0
+        self.gain = 1.0
+
+        # Buffers de trabajo preasignados; sólo crecen si llega un chunk mayor
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._output = np.empty(0, dtype=np.int16)
+
+    def reset(self):
+        self.rms_envelope = 0.0
+        self.peak_envelope = 0.0
+        self.gain = 1.0
+
+    def _ensure_capacity(self, n):
+        if self._scratch.shape[0] < n:
+            self._scratch = np.empty(n, dtype=np.float32)
+            self._output = np.empty(n, dtype=np.int16)
+
+    def _follow(self, envelope, value):
+        coef = self.attack if value > envelope else self.release
+        return envelope + coef * (value - envelope)
+
+    def process(self, audio_data):
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        n = samples.shape[0]
+        if n == 0:
+            return audio_data
+        self._ensure_capacity(n)
+        scratch = self._scratch[:n]
+        output = self._output[:n]
+
+        # Medir pico y RMS del chunk sin crear arrays temporales
+        np.copyto(scratch, samples, casting='unsafe')
+        peak = float(max(int(samples.max()), -int(samples.min())))
+        rms = float(np.sqrt(np.dot(scratch, scratch) / n))
+
+        self.rms_envelope = self._follow(self.rms_envelope, rms)
+        self.peak_envelope = self._follow(self.peak_envelope, peak)
+
+        # Ganancia objetivo según la envolvente, limitada por el pico para no saturar
+        if self.rms_envelope < self.noise_floor:
+            target_gain = 1.0
+        else:
+            target_gain = self.target_rms / self.rms_envelope
+        if self.peak_envelope > 0:
+            target_gain = min(target_gain, self.target_peak / self.peak_envelope)
+        target_gain = min(max(target_gain, self.min_gain), self.max_gain)
+        self.gain += self.gain_smoothing * (target_gain - self.gain)
+
+        # Aplicar ganancia en el buffer de trabajo; recortar al rango int16 sólo si el pico lo desborda
+        np.multiply(scratch, self.gain, out=scratch)
+        if peak * self.gain > 32767:
+            np.clip(scratch, -32768, 32767, out=scratch)
+        np.copyto(output, scratch, casting='unsafe')
+        return output.tobytes()
@@ -1,42 +1,106 @@
 # audio_handler.py
 import pyaudio
-from pydub import AudioSegment
-from pydub.effects import normalize
+from audio_gain import AutomaticGainControl
+from ring_buffer import AudioRingBuffer
 
 class AudioStreamHandler:
-    def __init__(self, rate=16000, chunk_size=1024, format=pyaudio.paInt16, channels=1):
+    def __init__(self, rate=16000, chunk_size=1024, format=pyaudio.paInt16, channels=1, normalization="agc",
+                 capture_mode="blocking", buffer_seconds=2.0, batch_chunks=4, stream=None,
+                 input_device_index=None):
         self.rate = rate
         self.chunk_size = chunk_size
         self.format = format
         self.channels = channels
+        self.input_device_index = input_device_index  # None: micrófono por defecto
+        # "agc": ganancia continua con NumPy; "pydub": normalización por chunk (modo anterior)
+        self.normalization = normalization
+        self.agc = AutomaticGainControl()
+        # "blocking": stream.read en el hilo del reconocedor; "callback": PortAudio escribe en un buffer circular
+        self.capture_mode = capture_mode
+        self.batch_chunks = batch_chunks
 
-        self.p = pyaudio.PyAudio()  # Inicializar PyAudio
-        self.sample_width = self.p.get_sample_size(self.format)  # Obtener sample_width después de inicializar PyAudio
+        # Con un stream inyectado (p. ej. un WAV en pruebas o benchmarks) no se abre PyAudio
+        self.external_stream = stream is not None
+        self.p = None if self.external_stream else pyaudio.PyAudio()  # Inicializar PyAudio
+        self.sample_width = pyaudio.get_sample_size(self.format)
 
-        self.stream = None
+        self.stream = stream
+
+        self.frame_bytes = self.sample_width * self.channels
+        self.ring_buffer = None
+        self.input_overflows = 0
+        if self.capture_mode == "callback":
+            capacity = int(self.rate * buffer_seconds) * self.frame_bytes
+            self.ring_buffer = AudioRingBuffer(capacity)
 
     def start_stream(self):
+        # Ya abierto (o inyectado): no volver a abrir el dispositivo
+        if self.stream is not None:
+            return
+        if self.capture_mode == "callback":
+            self.ring_buffer.clear()
+            self.stream = self.p.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                input_device_index=self.input_device_index,
+                frames_per_buffer=self.chunk_size,
+                stream_callback=self._stream_callback
+            )
+            return
         self.stream = self.p.open(
             format=self.format,
             channels=self.channels,
             rate=self.rate,
             input=True,
+            input_device_index=self.input_device_index,
             frames_per_buffer=self.chunk_size
         )
 
+    def _stream_callback(self, in_data, frame_count, time_info, status_flags):
+        # Se ejecuta en el hilo de PortAudio: sólo copiar al buffer y volver
+        if status_flags & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.ring_buffer.write(in_data)
+        return (None, pyaudio.paContinue)
+
     def read_stream(self):
+        if self.capture_mode == "callback":
+            # Vaciar en lotes de varios chunks para reducir llamadas al decodificador
+            batch_bytes = self.chunk_size * self.batch_chunks * self.frame_bytes
+            timeout = self.chunk_size * self.batch_chunks / self.rate * 2
+            data = self.ring_buffer.read(batch_bytes, timeout=timeout)
+            return data if data else None
         try:
             return self.stream.read(self.chunk_size, exception_on_overflow=False)
         except IOError:
             return None
 
+    def get_capture_stats(self):
+        if self.ring_buffer is None:
+            return {"capture_mode": self.capture_mode}
+        stats = self.ring_buffer.get_stats()
+        stats["capture_mode"] = self.capture_mode
+        stats["input_overflows"] = self.input_overflows
+        return stats
+
     def close_stream(self):
         if self.stream is not None:
             self.stream.stop_stream()
             self.stream.close()
-        self.p.terminate()
+            self.stream = None
+        if self.p is not None:
+            self.p.terminate()
 
     def preprocess_audio(self, audio_data):
+        if self.normalization == "pydub":
+            return self.preprocess_audio_pydub(audio_data)
+        return self.agc.process(audio_data)
+
+    def preprocess_audio_pydub(self, audio_data):
+        from pydub import AudioSegment
+        from pydub.effects import normalize
         audio_segment = AudioSegment(
             data=audio_data,
             sample_width=self.sample_width,
@@ -0,0 +1,115 @@
+# audio_sources.py
+import socket
+import time
+import wave
+
+class WavFileStream:
+    # Sustituye al stream de PyAudio leyendo un WAV (16 bits, mono); útil sin micrófono
+    def __init__(self, path=None, frames=None, rate=16000, realtime=True, trailing_silence=1.0, repeat=1):
+        if path is not None:
+            with wave.open(path, "rb") as wav:
+                if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+                    raise ValueError(f"{path}: se esperaba audio mono de 16 bits")
+                rate = wav.getframerate()
+                frames = wav.readframes(wav.getnframes())
+        self.rate = rate
+        # Silencio final para que el VAD y Vosk cierren el último enunciado
+        self.data = (bytes(frames or b"") + b"\x00\x00" * int(rate * trailing_silence)) * repeat
+        self.realtime = realtime
+        self.position = 0
+        self.finished = False
+        # Instante (reloj de pared, como python-can) en que se entregó cada chunk
+        self.delivery_times = []
+        self._start = None
+
+    @property
+    def duration(self):
+        return len(self.data) / 2 / self.rate
+
+    def read(self, num_frames, exception_on_overflow=False):
+        if self._start is None:
+            self._start = time.perf_counter()
+        end = min(len(self.data), self.position + num_frames * 2)
+        if self.position >= end:
+            self.finished = True
+            return b""
+        if self.realtime:
+            # Entregar al ritmo del micrófono: el chunk no existe antes de que termine de "grabarse"
+            ready_at = self._start + end / 2 / self.rate
+            delay = ready_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        chunk = self.data[self.position:end]
+        self.position = end
+        self.delivery_times.append(time.time())
+        return chunk
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.finished = True
+
+
+class MicrophoneSource:
+    # Micrófono local vía PyAudio; input_device_index elige el micrófono de cada cabina
+    def __init__(self, rate=16000, chunk_size=1024, input_device_index=None):
+        from audio_handler import AudioStreamHandler
+        self.rate = rate
+        self.handler = AudioStreamHandler(rate=rate, chunk_size=chunk_size, input_device_index=input_device_index)
+        self.handler.start_stream()
+        self.finished = False
+
+    def read(self, num_frames, exception_on_overflow=False):
+        if self.finished:
+            return b""
+        return self.handler.stream.read(num_frames, exception_on_overflow=exception_on_overflow)
+
+    def close(self):
+        self.finished = True
+        self.handler.close_stream()
+
+
+class SocketSource:
+    # PCM de 16 bits mono recibido por un socket ya conectado (p. ej. el reenviador de un vehículo remoto)
+    def __init__(self, sock, rate=16000):
+        self.sock = sock
+        self.rate = rate
+        self.finished = False
+
+    @classmethod
+    def connect(cls, address, rate=16000):
+        # address: ruta de un socket Unix o (host, puerto)
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(address)
+        return cls(sock, rate)
+
+    def read(self, num_frames, exception_on_overflow=False):
+        # Bloquea hasta tener el chunk completo; al cerrarse la conexión devuelve lo que quede
+        buffer = bytearray(num_frames * 2)
+        view = memoryview(buffer)
+        received = 0
+        while received < len(buffer) and not self.finished:
+            try:
+                n = self.sock.recv_into(view[received:])
+            except OSError:
+                n = 0
+            if n == 0:
+                self.finished = True
+                break
+            received += n
+        # Nunca entregar media muestra
+        return bytes(view[:received - received % 2])
+
+    def interrupt(self):
+        # Desbloquea un recv en curso desde otro hilo sin liberar el descriptor que está usando
+        self.finished = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.interrupt()
+        self.sock.close()
@@ -0,0 +1,234 @@
+# batch_eval.py
+# Evaluación sin conexión: transcribe grabaciones y mide el acierto de comandos sin CAN ni GUI.
+# Corpus: un directorio por comando esperado (p. ej. corpus/encender_luces/*.wav) y directorios de
+# grabaciones que no deben disparar nada (por defecto "negativos").
+# Uso: python src/batch_eval.py corpus/ [otro_corpus/ ...] [--model ./model] [--workers 8] [--output resultados.jsonl]
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import wave
+from collections import deque
+import numpy as np
+from audio_gain import AutomaticGainControl
+from voice_activity import VoiceActivityDetector, VoiceActivityGate
+from command_processor import CommandProcessor
+from command_handler import CommandHandler
+from utterance_decoder import UtteranceDecoder
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+
+# Estado de cada proceso del pool: un vosk.Model por proceso, cargado una sola vez
+_worker = {}
+
+def load_audio(path):
+    # Devuelve (frecuencia, muestras int16 mono)
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("se esperaba audio de 16 bits")
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    else:
+        try:
+            import soundfile
+        except ImportError:
+            from pydub import AudioSegment
+            segment = AudioSegment.from_file(path).set_sample_width(2)
+            rate, channels = segment.frame_rate, segment.channels
+            samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+        else:
+            data, rate = soundfile.read(path, dtype="int16", always_2d=True)
+            channels = data.shape[1]
+            samples = data.reshape(-1)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return rate, samples
+
+def match_text(text, keyword_list, threshold):
+    # La misma decisión que CommandProcessor.process_command, sin despachar nada.
+    # Umbral fijo: el resultado no depende de la hora a la que se ejecute la evaluación
+    if "ayuda" in text:
+        return "ayuda"
+    command = CommandProcessor.extract_command(text, keyword_list)
+    if command is None:
+        return None
+    return CommandHandler.get_best_match(command, threshold=threshold)
+
+def init_worker(model_path, options):
+    import vosk
+    vosk.SetLogLevel(-1)
+    _worker["vosk"] = vosk
+    _worker["model"] = vosk.Model(model_path)
+    _worker["options"] = options
+    _worker["grammar"] = CommandProcessor.build_grammar(options["keywords"]) if options["grammar"] else None
+
+def transcribe(rate, samples, options):
+    vosk = _worker["vosk"]
+    if _worker["grammar"]:
+        recognizer = vosk.KaldiRecognizer(_worker["model"], rate, _worker["grammar"])
+    else:
+        recognizer = vosk.KaldiRecognizer(_worker["model"], rate)
+    gate = None
+    if options["vad"]:
+        gate = VoiceActivityGate(VoiceActivityDetector(), deque(maxlen=options["preroll_chunks"]),
+                                 hangover_chunks=options["hangover_chunks"])
+    decoder = UtteranceDecoder(recognizer, gate, AutomaticGainControl())
+    data = samples.tobytes()
+    step = options["chunk_size"] * 2
+    for offset in range(0, len(data), step):
+        decoder.push(data[offset:offset + step])
+    decoder.finish()
+    return decoder.texts
+
+def evaluate_file(item):
+    path, expected = item
+    options = _worker["options"]
+    result = {"file": path, "expected": expected}
+    # Un archivo ilegible o que Vosk rechaza queda como error; no detiene el resto de la evaluación
+    try:
+        rate, samples = load_audio(path)
+        start = time.perf_counter()
+        texts = transcribe(rate, samples, options)
+        commands = [c for c in (match_text(text, options["keywords"], options["threshold"]) for text in texts) if c]
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    audio_s = len(samples) / rate
+    predicted = commands[0] if commands else None
+    result.update({
+        "texts": texts,
+        "commands": commands,
+        "predicted": predicted,
+        "correct": predicted == expected if expected is not None else not commands,
+        "audio_s": round(audio_s, 3),
+        "decode_s": round(elapsed, 4),
+        "rtf": round(elapsed / audio_s, 4) if audio_s else None,
+    })
+    return result
+
+def find_recordings(roots, negative_labels):
+    # La etiqueta es el nombre del directorio que contiene la grabación
+    items = []
+    for root in roots:
+        for directory, _, files in os.walk(root):
+            if os.path.normpath(directory) == os.path.normpath(root):
+                # Sin subdirectorio no hay etiqueta: el nombre del corpus no es un comando
+                skipped = [name for name in files if name.lower().endswith(AUDIO_EXTENSIONS)]
+                if skipped:
+                    logging.warning(f"Se ignoran {len(skipped)} grabaciones sin etiqueta en la raíz de {root}.")
+                continue
+            label = os.path.basename(os.path.normpath(directory))
+            expected = None if label in negative_labels else label.replace("_", " ")
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    items.append((os.path.join(directory, name), expected))
+    return items
+
+class Summary:
+    def __init__(self):
+        self.files = 0
+        self.errors = 0
+        self.positives = 0
+        self.correct = 0
+        self.misfires = 0
+        self.negatives = 0
+        self.false_triggers = 0
+        self.unknown_labels = set()
+        self.audio_s = 0.0
+        self.decode_s = 0.0
+
+    def add(self, result):
+        self.files += 1
+        if "error" in result:
+            self.errors += 1
+            return
+        self.audio_s += result["audio_s"]
+        self.decode_s += result["decode_s"]
+        expected = result["expected"]
+        if expected is None:
+            self.negatives += 1
+            self.false_triggers += bool(result["commands"])
+            return
+        if expected not in CommandHandler.commands_list and expected != "ayuda":
+            self.unknown_labels.add(expected)
+        self.positives += 1
+        if result["correct"]:
+            self.correct += 1
+        elif result["predicted"] is not None:
+            self.misfires += 1
+
+    def as_dict(self, wall_s, workers):
+        return {
+            "files": self.files,
+            "errors": self.errors,
+            "positives": self.positives,
+            "command_accuracy": round(self.correct / self.positives, 4) if self.positives else None,
+            "wrong_command_rate": round(self.misfires / self.positives, 4) if self.positives else None,
+            "negatives": self.negatives,
+            "false_trigger_rate": round(self.false_triggers / self.negatives, 4) if self.negatives else None,
+            "unknown_labels": sorted(self.unknown_labels),
+            "audio_s": round(self.audio_s, 2),
+            "rtf": round(self.decode_s / self.audio_s, 4) if self.audio_s else None,
+            "wall_s": round(wall_s, 2),
+            "x_realtime": round(self.audio_s / wall_s, 2) if wall_s else None,
+            "workers": workers,
+        }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="+", help="Directorios con un subdirectorio por comando esperado")
+    parser.add_argument("--model", default="./model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--negative-label", action="append", dest="negative_labels",
+                        help="Nombre de directorio sin comando esperado (por defecto: negativos)")
+    parser.add_argument("--keywords", nargs="+", default=CommandProcessor.default_keywords)
+    parser.add_argument("--grammar", action="store_true", help="Restringir Vosk a palabras clave y comandos")
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--threshold", type=int, default=CommandHandler.confidence_threshold["day"],
+                        help="Confianza mínima de la búsqueda difusa (fija, no depende de la hora)")
+    parser.add_argument("--output", help="Archivo JSON lines de resultados (por defecto, la salida estándar)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    items = find_recordings(args.corpus, set(args.negative_labels or ["negativos"]))
+    if not items:
+        parser.error("no se encontraron grabaciones WAV/FLAC")
+    options = {
+        "keywords": args.keywords,
+        "grammar": args.grammar,
+        "vad": not args.no_vad,
+        "chunk_size": args.chunk_size,
+        "threshold": args.threshold,
+        "preroll_chunks": 4,
+        "hangover_chunks": 8,
+    }
+    workers = max(1, min(args.workers, len(items)))
+    logging.info(f"Evaluando {len(items)} grabaciones con {workers} procesos.")
+
+    summary = Summary()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        # Lotes pequeños: reparto equilibrado sin pagar un viaje entre procesos por archivo
+        chunksize = max(1, min(32, len(items) // (workers * 8)))
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(args.model, options)) as pool:
+            for result in pool.imap_unordered(evaluate_file, items, chunksize=chunksize):
+                summary.add(result)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+        totals = summary.as_dict(time.perf_counter() - start, workers)
+        out.write(json.dumps({"summary": totals}, ensure_ascii=False) + "\n")
+        logging.info(f"Resumen: {totals}")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
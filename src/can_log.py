@@ -0,0 +1,271 @@
+# can_log.py
+# Grabación y reproducción de tráfico CAN.
+# Formato: cabecera fija + registros de 24 bytes (marca de tiempo, ID, DLC, flags, 8 bytes de datos),
+# con un índice aparte (.idx) de (marca de tiempo, número de registro) cada index_every registros.
+# Uso: python src/can_log.py record salida.dvcan [--all]
+#      python src/can_log.py replay entrada.dvcan [--speed 1 | --speed 10 | --speed 0 (máxima)]
+#      python src/can_log.py info entrada.dvcan
+import argparse
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import can
+from can_receptor import CanReceptor
+
+MAGIC = b"DVCANLG1"
+HEADER = struct.Struct("<8sHHI")          # magic, versión, tamaño de registro, index_every
+RECORD = struct.Struct("<dIBB2x8s")       # timestamp, arbitration_id, dlc, flags, datos
+INDEX_ENTRY = struct.Struct("<dQ")        # timestamp, número de registro
+VERSION = 1
+
+FLAG_EXTENDED = 0x01
+FLAG_REMOTE = 0x02
+FLAG_ERROR = 0x04
+
+class CanLogWriter:
+    def __init__(self, path, index_every=4096):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.index_every = index_every
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._index = open(self.index_path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, index_every))
+
+    def write(self, msg):
+        flags = ((FLAG_EXTENDED if msg.is_extended_id else 0) | (FLAG_REMOTE if msg.is_remote_frame else 0)
+                 | (FLAG_ERROR if msg.is_error_frame else 0))
+        record = RECORD.pack(msg.timestamp, msg.arbitration_id, msg.dlc, flags, bytes(msg.data))
+        with self._lock:
+            if self.records % self.index_every == 0:
+                self._index.write(INDEX_ENTRY.pack(msg.timestamp, self.records))
+            self._file.write(record)
+            self.records += 1
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._index.close()
+
+
+class CanRecorder(can.Listener):
+    # Graba lo que llega al bus; por defecto sólo los PGN que CanReceptor sabe decodificar
+    def __init__(self, path, interface='virtual', channel=None, only_known=True, index_every=4096):
+        filters = CanReceptor.build_filters() if only_known else None
+        self.bus = can.interface.Bus(interface=interface, channel=channel, can_filters=filters)
+        self.writer = CanLogWriter(path, index_every=index_every)
+        self.notifier = None
+
+    def on_message_received(self, msg):
+        self.writer.write(msg)
+
+    def start(self):
+        self.notifier = can.Notifier(self.bus, [self], timeout=0.5)
+
+    def close(self):
+        if self.notifier is not None:
+            self.notifier.stop()
+            self.notifier = None
+        self.writer.close()
+        self.bus.shutdown()
+        logging.info(f"Grabación cerrada: {self.writer.records} tramas en {self.writer.path}.")
+
+
+class CanLogReader:
+    # Lectura por mmap: el sistema operativo pagina el archivo, nunca se carga entero en memoria
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.index_every = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path}: no es un registro CAN válido")
+        # Un registro a medio escribir (corte de energía) se ignora
+        self.records = (len(self._map) - HEADER.size) // RECORD.size
+        self._index = self._load_index(path + ".idx")
+
+    def _load_index(self, index_path):
+        if not os.path.exists(index_path):
+            return [], []
+        with open(index_path, "rb") as f:
+            data = f.read()
+        entries = [entry for entry in INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size])
+                   if entry[1] < self.records]
+        return [t for t, _ in entries], [n for _, n in entries]
+
+    def __len__(self):
+        return self.records
+
+    def record(self, number):
+        return RECORD.unpack_from(self._map, HEADER.size + number * RECORD.size)
+
+    def timestamp(self, number):
+        return struct.unpack_from("<d", self._map, HEADER.size + number * RECORD.size)[0]
+
+    def message(self, number):
+        return self.to_message(self.record(number))
+
+    @staticmethod
+    def to_message(record):
+        timestamp, arbitration_id, dlc, flags, data = record
+        return can.Message(timestamp=timestamp, arbitration_id=arbitration_id, data=data[:dlc], dlc=dlc,
+                           is_extended_id=bool(flags & FLAG_EXTENDED), is_remote_frame=bool(flags & FLAG_REMOTE),
+                           is_error_frame=bool(flags & FLAG_ERROR))
+
+    def iter_records(self, start=0, stop=None, block_records=65536):
+        # Desempaqueta por bloques acotados copiados del mmap: memoria constante aunque el archivo ocupe GB
+        stop = self.records if stop is None else min(stop, self.records)
+        for first in range(start, stop, block_records):
+            last = min(stop, first + block_records)
+            yield from RECORD.iter_unpack(self._map[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size])
+
+    def find_time(self, timestamp):
+        # Primer registro con marca de tiempo >= timestamp: índice para acotar y búsqueda binaria en el bloque
+        times, numbers = self._index
+        position = bisect.bisect_right(times, timestamp) - 1
+        low = numbers[position] if position >= 0 else 0
+        high = numbers[position + 1] if position + 1 < len(numbers) else self.records
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @property
+    def start_time(self):
+        return self.timestamp(0) if self.records else None
+
+    @property
+    def duration(self):
+        return self.timestamp(self.records - 1) - self.timestamp(0) if self.records else 0.0
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class CanReplayer:
+    # speed=1: tiempo real; speed=N: N veces más rápido; speed=0: tan rápido como acepte el bus
+    def __init__(self, reader, interface='virtual', channel=None, speed=1.0, spin_threshold=0.002):
+        self.reader = reader
+        self.bus = can.interface.Bus(interface=interface, channel=channel)
+        self.speed = speed
+        self.spin_threshold = spin_threshold  # Último tramo de espera activa para no depender del sleep del SO
+        self.sent = 0
+        self.errors = 0
+        self.late = 0
+        self.lateness = []
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, start=0, stop=None, sample_every=64):
+        # Devuelve el tiempo real empleado; la desviación respecto al horario se muestrea cada sample_every tramas
+        to_message = self.reader.to_message
+        first_time = None
+        wall_start = time.perf_counter()
+        for number, record in enumerate(self.reader.iter_records(start, stop)):
+            if self._stop.is_set():
+                break
+            if self.speed:
+                if first_time is None:
+                    first_time = record[0]
+                due = wall_start + (record[0] - first_time) / self.speed
+                delay = due - time.perf_counter()
+                if delay > self.spin_threshold:
+                    time.sleep(delay - self.spin_threshold)
+                while time.perf_counter() < due:
+                    pass
+            msg = to_message(record)
+            try:
+                self.bus.send(msg)
+                self.sent += 1
+            except can.CanError as e:
+                self.errors += 1
+                logging.error(f"Error al reproducir la trama {hex(msg.arbitration_id)}: {e}")
+            if self.speed and number % sample_every == 0:
+                behind = time.perf_counter() - due
+                self.lateness.append(behind)
+                if behind > 0.001:
+                    self.late += 1
+        return time.perf_counter() - wall_start
+
+    def get_stats(self):
+        ordered = sorted(self.lateness)
+        return {
+            "sent": self.sent,
+            "errors": self.errors,
+            "speed": self.speed or "max",
+            "late_samples": self.late,
+            "lateness_p50_us": round(ordered[len(ordered) // 2] * 1e6, 1) if ordered else None,
+            "lateness_p99_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6, 1) if ordered else None,
+        }
+
+    def close(self):
+        self.bus.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="action", required=True)
+    record = sub.add_parser("record")
+    record.add_argument("path")
+    record.add_argument("--interface", default="virtual")
+    record.add_argument("--channel")
+    record.add_argument("--all", action="store_true", help="Grabar también los PGN que CanReceptor no decodifica")
+    replay = sub.add_parser("replay")
+    replay.add_argument("path")
+    replay.add_argument("--interface", default="virtual")
+    replay.add_argument("--channel")
+    replay.add_argument("--speed", type=float, default=1.0)
+    info = sub.add_parser("info")
+    info.add_argument("path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.action == "record":
+        recorder = CanRecorder(args.path, args.interface, args.channel, only_known=not args.all)
+        recorder.start()
+        logging.info(f"Grabando en {args.path}; Ctrl+C para terminar.")
+        try:
+            while True:
+                time.sleep(1.0)
+                recorder.writer.flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            recorder.close()
+        return
+
+    reader = CanLogReader(args.path)
+    try:
+        if args.action == "info":
+            print(f"{reader.records} tramas, {reader.duration:.3f} s, inicio {reader.start_time}")
+            return
+        replayer = CanReplayer(reader, args.interface, args.channel, speed=args.speed)
+        try:
+            elapsed = replayer.run()
+        except KeyboardInterrupt:
+            elapsed = None
+        finally:
+            replayer.close()
+        logging.info(f"Reproducción terminada en {elapsed} s: {replayer.get_stats()}")
+    finally:
+        reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,212 @@
 import can
 import logging
+import time
+from collections import Counter
+from types import MappingProxyType
+
+# Resultados precalculados (señales, texto); decodificar no crea objetos nuevos salvo el nivel de combustible.
+# Las señales usan las mismas claves que el estado de CommandHandler.
+NO_SIGNALS = MappingProxyType({})
+DOOR_STATUS = (
+    (MappingProxyType({"puerta": False}), "Puertas cerradas"),
+    (MappingProxyType({"puerta": True}), "Puertas abiertas"),
+    (NO_SIGNALS, "Error en el sistema de puertas"),
+    (NO_SIGNALS, "Estado de puertas no disponible"),
+)
+LIGHTS_STATUS = tuple(
+    (MappingProxyType({"luces_exteriores": bool(byte_0 & 0b01), "luces_cabina": bool(byte_0 & 0b100)}),
+     f"{'Luces exteriores encendidas' if byte_0 & 0b01 else 'Luces exteriores apagadas'}, "
+     f"{'Luces interiores encendidas' if byte_0 & 0b100 else 'Luces interiores apagadas'}")
+    for byte_0 in range(256)
+)
+ENGINE_STATUS = (
+    (MappingProxyType({"motor": False}), "Motor apagado"),
+    (MappingProxyType({"motor": True}), "Motor encendido"),
+)
+
+def pgn_of(arbitration_id):
+    # J1939: en PDU1 (PF < 240) el byte PS es la dirección de destino y no forma parte del PGN
+    pgn = (arbitration_id >> 8) & 0x3FFFF
+    if ((pgn >> 8) & 0xFF) < 240:
+        pgn &= 0x3FF00
+    return pgn
+
+def decode_door(data):
+    return DOOR_STATUS[data[0] & 0b00000011]
+
+def decode_lights(data):
+    return LIGHTS_STATUS[data[0]]
+
+def decode_fuel(data):
+    # SPN 96 (Fuel Level 1): byte 2, 0.4 %/bit
+    fuel_level = round(data[1] * 0.4, 2)
+    return {"nivel_combustible": fuel_level}, f"Nivel de combustible: {fuel_level:.2f}%"
+
+def decode_engine(data):
+    return ENGINE_STATUS[data[0] & 0b01]
+
+class RateLimitedLog:
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def add(self, text):
+        self.pending[text] += 1
+
+    def flush(self, force=False):
+        # Agrupa los mensajes iguales y los emite como mucho una vez por intervalo
+        now = time.monotonic()
+        if not self.pending or (not force and now - self._last_flush < self.interval):
+            return
+        self._last_flush = now
+        for text, count in self.pending.items():
+            if count == 1:
+                logging.info(f"Decodificación CAN: {text}")
+            else:
+                logging.info(f"Decodificación CAN: {text} (x{count})")
+        self.pending.clear()
 
 class CanReceptor:
-    def __init__(self):
-        self.bus = can.interface.Bus(interface='virtual')
+    # Tabla de decodificación por PGN
+    decoders = {
+        0xFEE2: decode_door,     # 0x18FEE200
+        0xFEF1: decode_lights,   # 0x18FEF157
+        0xFEFC: decode_fuel,     # 0x18FEFC00, respuesta a la solicitud 0x18EAFF00
+        0xFEF2: decode_engine,   # 0x18FEF200
+    }
+    # Bytes que lee cada decodificador; las tramas más cortas se descartan sin decodificar
+    min_lengths = {
+        0xFEE2: 1,
+        0xFEF1: 1,
+        0xFEFC: 2,
+        0xFEF2: 1,
+    }
+
+    def __init__(self, interface='virtual', channel=None, batch_size=256, log_interval=1.0, store=None, requests=None):
+        self.bus = can.interface.Bus(interface=interface, channel=channel, can_filters=self.build_filters())
+        self.batch_size = batch_size
+        self.log = RateLimitedLog(log_interval)
+        # Almacén de estado del vehículo que se alimenta con las señales decodificadas
+        self.store = store
+        # Solicitudes J1939 en curso (J1939Requests): se resuelven con las señales de la respuesta
+        self.requests = requests
+        self.reader = None
+        self.notifier = None
+        self.running = False
+        self.frames = 0
+        self.unknown = 0      # Tramas sin decodificador, demasiado cortas o que fallaron al decodificar
+        self.malformed = 0
+        self.decode_time = 0.0
+        # Caché id -> (PGN, decodificador, longitud mínima), para no recalcular el PGN en cada trama
+        self._by_id = {}
+
+    @classmethod
+    def build_filters(cls):
+        # Filtros en el bus: sólo llegan a Python los PGN que sabemos decodificar
+        filters = []
+        for pgn in cls.decoders:
+            mask = 0x03FF0000 if ((pgn >> 8) & 0xFF) < 240 else 0x03FFFF00
+            filters.append({"can_id": pgn << 8, "can_mask": mask, "extended": True})
+        return filters
+
+    def lookup(self, arbitration_id):
+        entry = self._by_id.get(arbitration_id)
+        if entry is None:
+            pgn = pgn_of(arbitration_id)
+            entry = pgn, self.decoders.get(pgn), self.min_lengths.get(pgn, 1)
+            if entry[1] is not None:
+                self._by_id[arbitration_id] = entry
+        return entry
+
+    def decoder_for(self, arbitration_id):
+        return self.lookup(arbitration_id)[1]
 
     def decode_message(self, message):
-        if message.arbitration_id == 0x18FEE200:  
-            spn_1744 = message.data[0] & 0b00000011
-            status = {
-                0b00: "Puertas cerradas",
-                0b01: "Puertas abiertas",
-                0b10: "Error en el sistema de puertas",
-                0b11: "Estado de puertas no disponible"
-            }.get(spn_1744, "Estado desconocido")
-            return status
-
-        elif message.arbitration_id == 0x18FEF157:  
-            exterior = "Luces exteriores encendidas" if message.data[0] & 0b01 else "Luces exteriores apagadas"
-            interior = "Luces interiores encendidas" if (message.data[0] & 0b100) >> 2 else "Luces interiores apagadas"
-            return f"{exterior}, {interior}"
-
-        elif message.arbitration_id == 0x18EAFF00:  
-            fuel_level = message.data[0] * 0.4  
-            return f"Nivel de combustible: {fuel_level:.2f}%"
-
-        elif message.arbitration_id == 0x18FEF200:  
-            engine_status = "Motor encendido" if message.data[0] & 0b01 else "Motor apagado"
-            return engine_status
-
-        return f"Mensaje no reconocido (ID: {hex(message.arbitration_id)})"
+        _, decoder, min_length = self.lookup(message.arbitration_id)
+        if decoder is None:
+            return f"Mensaje no reconocido (ID: {hex(message.arbitration_id)})"
+        if len(message.data) < min_length:
+            return f"Trama demasiado corta (ID: {hex(message.arbitration_id)}, {len(message.data)} bytes)"
+        return decoder(message.data)[1]
+
+    def start(self):
+        self.reader = can.BufferedReader()
+        self.notifier = can.Notifier(self.bus, [self.reader], timeout=0.5)
+        self.running = True
+
+    def stop(self):
+        # Pide al bucle de recepción que termine; el cierre lo hace close()
+        self.running = False
+
+    def close(self):
+        self.running = False
+        if self.notifier is not None:
+            self.notifier.stop()
+            self.notifier = None
+        self.log.flush(force=True)
+        self.bus.shutdown()
+
+    def process_batch(self, timeout=1.0):
+        # Espera la primera trama y procesa las que ya estén en cola, hasta batch_size
+        message = self.reader.get_message(timeout)
+        if message is None:
+            self.log.flush()
+            return 0
+        count = 0
+        changes = {}
+        requests = self.requests
+        start = time.perf_counter()
+        while message is not None:
+            pgn, decoder, min_length = self.lookup(message.arbitration_id)
+            if decoder is None:
+                self.unknown += 1
+            elif len(message.data) < min_length:
+                self.unknown += 1
+                self.malformed += 1
+                self.log.add(f"Trama demasiado corta (ID: {hex(message.arbitration_id)}, {len(message.data)} bytes)")
+            else:
+                # Un fallo en una trama no debe detener la recepción (ni el runtime)
+                try:
+                    signals, text = decoder(message.data)
+                    changes.update(signals)
+                    self.log.add(text)
+                    if requests is not None and pgn in requests.watched:
+                        requests.on_response(pgn, signals)
+                except Exception as e:
+                    self.unknown += 1
+                    self.malformed += 1
+                    self.log.add(f"Error al decodificar la trama {hex(message.arbitration_id)}: {e}")
+            count += 1
+            if count >= self.batch_size:
+                break
+            message = self.reader.get_message(0)
+        self.decode_time += time.perf_counter() - start
+        self.frames += count
+        # Una sola actualización del estado por lote; gana el último valor de cada señal
+        if changes and self.store is not None:
+            self.store.update(changes)
+        self.log.flush()
+        return count
+
+    def get_stats(self):
+        return {
+            "frames": self.frames,
+            "unknown": self.unknown,
+            "malformed": self.malformed,
+            "decode_us": round(self.decode_time / self.frames * 1e6, 2) if self.frames else 0.0,
+        }
 
     def receive(self):
         print("Esperando mensajes en el bus CAN...")
-        while True:
-            try:
-                message = self.bus.recv(timeout=1.0)
-                if message:
-                    decoded_message = self.decode_message(message)
-                    logging.info(f"Decodificación CAN: {decoded_message}")
-            except can.CanError as e:
-                logging.error(f"Error al recibir mensaje: {e}")
-            except KeyboardInterrupt:
-                print("Recepción interrumpida manualmente.")
-                break
+        self.start()
+        try:
+            while self.running:
+                try:
+                    self.process_batch()
+                except can.CanError as e:
+                    logging.error(f"Error al recibir mensaje: {e}")
+        except KeyboardInterrupt:
+            print("Recepción interrumpida manualmente.")
+        finally:
+            self.close()
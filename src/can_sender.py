@@ -1,35 +1,52 @@
-import can
-import logging
+from tx_scheduler import TransmitScheduler
 
 class CanSender:
-    def __init__(self):
-        self.bus = can.interface.Bus(interface='virtual')
+    def __init__(self, service=None):
+        # El bus es compartido y persistente; crear un CanSender ya no abre ningún bus.
+        # Por defecto pasa por el planificador, que agrupa tramas del mismo PGN y limita su frecuencia.
+        self.service = service if service is not None else TransmitScheduler.get()
 
     def send_message(self, arbitration_id, data):
-        msg = can.Message(arbitration_id=arbitration_id, data=data, is_extended_id=True)
-        try:
-            self.bus.send(msg)
-            logging.info(f"Mensaje enviado: ID={hex(arbitration_id)}, Datos={data}")
-        except can.CanError as e:
-            logging.error(f"Error al enviar el mensaje: {e}")
-        finally:
-            self.bus.shutdown()
+        # Devuelve un Future con el resultado del envío
+        return self.service.submit(arbitration_id, data)
 
-    def door_command(self, status: bool):
+    # Constructores de tramas: devuelven (arbitration_id, data) sin enviar nada
+    @staticmethod
+    def door_frame(status: bool):
         spn_1744 = 0b01 if status else 0b00
         data = [spn_1744] + [0x00] * 7  # Rellenar el resto con ceros
-        self.send_message(arbitration_id=0x18FEE200, data=data)
+        return 0x18FEE200, data
 
-    def lights_command(self, exterior: bool, interior: bool):
+    @staticmethod
+    def lights_frame(exterior: bool, interior: bool):
         byte_0 = (0b01 if exterior else 0b00) | ((0b01 if interior else 0b00) << 2)
         data = [byte_0] + [0x00] * 7  # Rellenar el resto con ceros
-        self.send_message(arbitration_id=0x18FEF157, data=data)
+        return 0x18FEF157, data
 
-    def fuel_level_request(self):
-        data = [0xEC, 0xFF, 0xFE, 0x00, 0x00, 0x00, 0x00, 0x00]  # Solicitud para PGN 65276
-        self.send_message(arbitration_id=0x18EAFF00, data=data)
+    @staticmethod
+    def request_frame(pgn, destination=0xFF, source=0x00):
+        # Solicitud J1939 (PGN 59904): el PGN pedido va en 3 bytes little-endian
+        data = [pgn & 0xFF, (pgn >> 8) & 0xFF, (pgn >> 16) & 0xFF]
+        return 0x18EA0000 | (destination << 8) | source, data
 
-    def engine_control(self, start: bool):
+    @staticmethod
+    def fuel_level_request_frame():
+        return CanSender.request_frame(0xFEFC)  # Solicitud para PGN 65276 (Dash Display)
+
+    @staticmethod
+    def engine_frame(start: bool):
         spn_engine = 0b01 if start else 0b00
         data = [spn_engine] + [0x00] * 7  # Rellenar el resto con ceros
-        self.send_message(arbitration_id=0x18FEF200, data=data)  # Ejemplo de ID para control del motor
+        return 0x18FEF200, data  # Ejemplo de ID para control del motor
+
+    def door_command(self, status: bool):
+        return self.send_message(*self.door_frame(status))
+
+    def lights_command(self, exterior: bool, interior: bool):
+        return self.send_message(*self.lights_frame(exterior, interior))
+
+    def fuel_level_request(self):
+        return self.send_message(*self.fuel_level_request_frame())
+
+    def engine_control(self, start: bool):
+        return self.send_message(*self.engine_frame(start))
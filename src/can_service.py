@@ -0,0 +1,108 @@
+# can_service.py
+import atexit
+import can
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class CanSenderService:
+    # Un servicio (y un bus) de larga duración por interfaz/canal
+    _services = {}
+    _services_lock = threading.Lock()
+
+    def __init__(self, interface='virtual', channel=None, queue_size=256):
+        self.interface = interface
+        self.channel = channel
+        self.bus = can.interface.Bus(interface=interface, channel=channel)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.errors = 0
+        self.rejected = 0
+        self.closed = False
+        self._thread = threading.Thread(target=self._writer, name=f"can-tx-{interface}", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls, interface='virtual', channel=None):
+        key = (interface, channel)
+        with cls._services_lock:
+            service = cls._services.get(key)
+            if service is None or service.closed:
+                service = cls(interface=interface, channel=channel)
+                cls._services[key] = service
+            return service
+
+    @classmethod
+    def shutdown_all(cls, timeout=2.0):
+        with cls._services_lock:
+            services = list(cls._services.values())
+            cls._services.clear()
+        for service in services:
+            service.shutdown(timeout)
+
+    def submit(self, arbitration_id, data, block=False, timeout=None):
+        # Encola la trama y devuelve un Future que se resuelve al enviarla
+        future = Future()
+        if self.closed:
+            future.set_exception(can.CanError("El servicio de transmisión está cerrado"))
+            return future
+        msg = can.Message(arbitration_id=arbitration_id, data=data, is_extended_id=True)
+        try:
+            self.queue.put((msg, future), block=block, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            future.set_exception(can.CanError("Cola de transmisión CAN llena"))
+        return future
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            msg, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                # Marca de tiempo de transmisión, con el mismo reloj que la recepción en python-can
+                msg.timestamp = time.time()
+                self.bus.send(msg)
+                self.sent += 1
+                future.set_result(msg)
+                logging.info(f"Mensaje enviado: ID={hex(msg.arbitration_id)}, Datos={list(msg.data)}")
+            except Exception as e:
+                # Cualquier fallo (CanError, OSError de una interfaz caída, datos inválidos) se entrega
+                # al Future de esa trama; el hilo sigue atendiendo la cola
+                self.errors += 1
+                future.set_exception(e)
+                logging.error(f"Error al enviar el mensaje: {e}")
+
+    def get_stats(self):
+        return {
+            "sent": self.sent,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "queued": self.queue.qsize(),
+        }
+
+    def shutdown(self, timeout=2.0):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logging.warning("Cola de transmisión llena al cerrar; se descartan las tramas pendientes.")
+        self._thread.join(timeout)
+        # Cancelar lo que no llegó a enviarse
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        self.bus.shutdown()
+
+atexit.register(CanSenderService.shutdown_all)
@@ -1,144 +1,169 @@
+import atexit
 import logging
+import os
 import time
-import numpy as np
-import joblib
 import threading
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from fuzzywuzzy import process as fuzz
+from collections import deque
 from can_sender import CanSender
+from command_trainer import BackgroundTrainer
+from command_journal import CommandJournal
+from migrate_history import migrate
+from command_matcher import CommandMatcher
+from command_registry import build_default_registry
+from j1939_requests import J1939Requests
+from vehicle_state import VehicleStateStore
 
 class CommandHandler:
 
-    # Lista global de comandos disponibles
-    commands_list = [
-        "encender luces de cabina", "apagar luces de cabina",
-        "encender luces exteriores", "apagar luces exteriores",
-        "abrir puerta", "cerrar puerta",
-        "consultar nivel de combustible", 
-        "encender motor", "apagar motor",
-    ]
+    # Registro declarativo: comando -> clave de estado, valor y constructor de trama CAN
+    registry = build_default_registry()
+
+    # Lista global de comandos disponibles (generada desde el registro)
+    commands_list = registry.names
 
     # Inicialización de modelos y parámetros
-    vectorizer = TfidfVectorizer().fit(commands_list)
-    model_ml = MultinomialNB()
-    command_history = []
-    time_history = []
     max_history_size = 100
+    command_history = deque(maxlen=max_history_size)
+    time_history = deque(maxlen=max_history_size)
+    history_lock = threading.Lock()
     confidence_threshold = {
         "day": 75,
         "night": 70,
     }
-    train_batch_size = 5
-
-    # Estado inicial de los dispositivos
-    state = {
-        "luces_cabina": False,
-        "luces_exteriores": False,
-        "puerta": False,
-        "nivel_combustible": None,
-        "motor": False,
-    }
 
-    # Lock para acceso seguro al estado compartido
+    # Persistencia: diario de eventos (comando, hora) con instantáneas compactadas
+    legacy_history_path = "command_history.pkl"
+    journal = CommandJournal("command_history", history_size=max_history_size)
+
+    # Estado de los dispositivos (apagados; las consultas empiezan sin valor).
+    # Lo actualizan tanto los comandos como las tramas decodificadas por CanReceptor.
+    store = VehicleStateStore({device.state_key: (False if device.toggle else None) for device in registry.devices})
+
+    # Consultas J1939: deduplicadas mientras están en curso y servidas desde caché si son recientes
+    requests = J1939Requests()
+
+    # Lock para que la lectura-modificación-envío de cada comando sea atómica
     state_lock = threading.RLock()
 
+    # Entrenamiento incremental (partial_fit) en un hilo de fondo
+    trainer = BackgroundTrainer()
+
+    # Índice de comandos para la búsqueda difusa; se reconstruye si cambia commands_list
+    matcher = None
+
     @classmethod
     def load_model(cls):
-        try:
-            data = joblib.load("command_history.pkl")
-            cls.command_history, cls.time_history = data['command_history'], data['time_history']
-            if cls.command_history:
-                X = cls.vectorizer.transform(cls.command_history)
-                y = np.array(cls.time_history)
-                cls.model_ml.fit(X, y)
-                logging.info("Modelo cargado exitosamente.")
-        except FileNotFoundError:
-            cls.command_history, cls.time_history = [], []
+        if not cls.journal.exists() and os.path.exists(cls.legacy_history_path):
+            os.makedirs(cls.journal.directory, exist_ok=True)
+            count = migrate(cls.legacy_history_path, cls.journal)
+            logging.info(f"Historial migrado desde {cls.legacy_history_path} ({count} comandos).")
+        counts, recent = cls.journal.recover()
+        with cls.history_lock:
+            # recent ya incluye lo registrado antes de terminar la carga (el arranque es en paralelo)
+            cls.command_history.clear()
+            cls.time_history.clear()
+            for command, hour in recent:
+                cls.command_history.append(command)
+                cls.time_history.append(hour)
+        if counts:
+            events = list(counts)
+            cls.trainer.fit_initial([c for c, _ in events], [h for _, h in events], [counts[e] for e in events])
+            logging.info("Modelo cargado exitosamente.")
+        else:
             logging.info("No se encontró un modelo previo. Se iniciará un nuevo modelo.")
+        cls.trainer.start()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def shutdown(cls):
+        cls.requests.cancel_all()
+        cls.trainer.stop()
+        cls.journal.close()
+
+    @classmethod
+    def get_best_match(cls, command, threshold=None):
+        # Coincidencia exacta (p. ej. en modo gramática): no hace falta la búsqueda difusa
+        if command in cls.commands_list:
+            return command
+        if threshold is None:
+            current_hour = time.localtime().tm_hour
+            threshold = cls.confidence_threshold["night"] if 22 <= current_hour or current_hour <= 6 else cls.confidence_threshold["day"]
+        best_match, confidence = cls.get_matcher().extract_one(command)
+        return best_match if confidence >= threshold else None
+
+    @classmethod
+    def get_matcher(cls):
+        if cls.matcher is None or cls.matcher.is_stale(cls.commands_list):
+            cls.matcher = CommandMatcher(cls.commands_list)
+        return cls.matcher
+
+    @classmethod
+    def resolve_command(cls, command):
+        spec = cls.registry.get(command)
+        if spec is None:
+            # Búsqueda difusa una sola vez; no se vuelve a recorrer el despacho
+            best_match = cls.get_best_match(command)
+            spec = cls.registry.get(best_match) if best_match else None
+            if spec is None:
+                cls.fallback_command(command)
+        return spec
 
     @classmethod
-    def get_best_match(cls, command):
-        current_hour = time.localtime().tm_hour
-        confidence_threshold = cls.confidence_threshold["night"] if 22 <= current_hour or current_hour <= 6 else cls.confidence_threshold["day"]
-        best_match, confidence = fuzz.extractOne(command, cls.commands_list)
-        return best_match if confidence >= confidence_threshold else None
+    def apply_command(cls, command):
+        # Actualiza el estado y devuelve la trama (arbitration_id, data) a enviar, o None
+        spec = cls.resolve_command(command)
+        if spec is not None and spec.request_pgn is not None:
+            # Las consultas no pasan por la cola de transmisión: las gestiona J1939Requests
+            cls.query(spec)
+            return None
+        return cls.apply_spec(spec) if spec else None
+
+    @classmethod
+    def query(cls, spec):
+        # Devuelve un Future con las señales de la respuesta; CanReceptor ya las vuelca en el estado
+        future = cls.requests.request(spec.request_pgn)
+
+        def on_response(f):
+            if f.cancelled():
+                return
+            if f.exception() is not None:
+                logging.warning(f"{spec.device}: {f.exception()}")
+                return
+            logging.info(f"{spec.device}: {f.result().get(spec.state_key)}")
+
+        future.add_done_callback(on_response)
+        return future
+
+    @classmethod
+    def apply_spec(cls, spec):
+        with cls.state_lock:
+            state = cls.store.snapshot()[1]
+            if spec.value is not None and state[spec.state_key] == spec.value:
+                logging.info(spec.already_message)
+                return None
+            if spec.value is not None:
+                cls.store.update({spec.state_key: spec.value})
+                state = cls.store.snapshot()[1]
+            return spec.build_frame(state)
 
     @classmethod
     def execute_command(cls, command):
-        message = None
+        # Devuelve el Future del envío CAN (o de la respuesta, en consultas), o None si no hubo trama
+        spec = cls.resolve_command(command)
+        if spec is None:
+            return None
+        if spec.request_pgn is not None:
+            return cls.query(spec)
         with cls.state_lock:
-            sender = CanSender()
-
-            if command == "encender luces de cabina":
-                if not cls.state["luces_cabina"]:
-                    cls.state["luces_cabina"] = True
-                    sender.lights_command(exterior=cls.state['luces_exteriores'], interior=True)
-                else:
-                    message = "Las luces de cabina ya están encendidas."
-
-            elif command == "apagar luces de cabina":
-                if cls.state["luces_cabina"]:
-                    cls.state["luces_cabina"] = False
-                    sender.lights_command(exterior=cls.state['luces_exteriores'], interior=False)
-                else:
-                    message = "Las luces de cabina ya están apagadas."
-
-            elif command == "encender luces exteriores":
-                if not cls.state["luces_exteriores"]:
-                    cls.state["luces_exteriores"] = True
-                    sender.lights_command(exterior=True, interior=cls.state['luces_cabina'])
-                else:
-                    message = "Las luces exteriores ya están encendidas."
-
-            elif command == "apagar luces exteriores":
-                if cls.state["luces_exteriores"]:
-                    cls.state["luces_exteriores"] = False
-                    sender.lights_command(exterior=False, interior=cls.state['luces_cabina'])
-                else:
-                    message = "Las luces exteriores ya están apagadas."
-
-            elif command == "abrir puerta":
-                if not cls.state["puerta"]:
-                    sender.door_command(True)
-                    cls.state["puerta"] = True
-                else:
-                    message = "La puerta ya está abierta."
-
-            elif command == "cerrar puerta":
-                if cls.state["puerta"]:
-                    sender.door_command(False)
-                    cls.state["puerta"] = False
-                else:
-                    message = "La puerta ya está cerrada."
-            elif command == "consultar nivel de combustible":
-                sender.fuel_level_request()
-            elif command == "encender motor":
-                if not cls.state["motor"]:
-                    sender.engine_control(True)
-                    cls.state["motor"] = True
-                else:
-                    message = "El motor ya está encendido."
-            elif command == "apagar motor":
-                if cls.state["motor"]:
-                    sender.engine_control(False)
-                    cls.state["motor"] = False
-                else:
-                    message = "El motor ya está apagado."
-            else:
-                best_match = cls.get_best_match(command)
-                if best_match:
-                    cls.execute_command(best_match)
-                    return
-                else:
-                    cls.fallback_command(command)
-                    return
-        if message:
-          logging.info(message)
+            frame = cls.apply_spec(spec)
+            if frame is None:
+                return None
+            # Sólo encola la trama; el envío lo hace el hilo del servicio CAN
+            return CanSender().send_message(*frame)
 
     @classmethod
     def fallback_command(cls, command):
-        suggestions = fuzz.extract(command, cls.commands_list, limit=3)
+        suggestions = cls.get_matcher().extract(command, limit=3)
         if suggestions:
             logging.warning(f"No se reconoció el comando: '{command}'. ¿Quizás quisiste decir?")
             for suggestion, confidence in suggestions:
@@ -148,39 +173,23 @@ class CommandHandler:
 
     @classmethod
     def schedule_training(cls, command, hour):
-        with cls.state_lock:
+        # No toma state_lock ni espera al entrenamiento: sólo registra y encola
+        with cls.history_lock:
             cls.command_history.append(command)
             cls.time_history.append(hour)
-            # Limitar el historial a los últimos 100 comandos
-            if len(cls.command_history) > cls.max_history_size:
-                cls.command_history = cls.command_history[-cls.max_history_size:]
-                cls.time_history = cls.time_history[-cls.max_history_size:]
-            # Entrenar el modelo después de acumular un batch de nuevos comandos
-            if len(cls.command_history) % cls.train_batch_size == 0:
-                cls.train_model()
-
-    @classmethod
-    def train_model(cls):
-        with cls.state_lock:
-            X = cls.vectorizer.fit_transform(cls.command_history)
-            y = np.array(cls.time_history)
-            cls.model_ml.fit(X, y)
-            joblib.dump({'command_history': cls.command_history, 'time_history': cls.time_history}, "command_history.pkl")
-            logging.info("Modelo entrenado y guardado exitosamente.")
+        # Una línea en el diario; el fsync se agrupa y la compactación va en segundo plano
+        cls.journal.append(command, hour)
+        cls.trainer.submit(command, hour)
 
     @classmethod
     def display_help(cls):
         logging.info("Lista de comandos disponibles:")
-        for command in cls.commands_list:
-            logging.info(f"- {command}")
+        for device in cls.registry.devices:
+            logging.info(f"{device.label}:")
+            for command in cls.registry.device_commands(device.label):
+                logging.info(f"- {command}")
         logging.info("Para obtener ayuda, puedes decir 'ayuda'.")
 
     @classmethod
     def get_state(cls):
-        with cls.state_lock:
-            return cls.state.copy()
-        
-    @classmethod
-    def get_state(cls):
-        with cls.state_lock:
-            return cls.state.copy()
+        return dict(cls.store.snapshot()[1])
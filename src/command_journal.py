@@ -0,0 +1,233 @@
+# command_journal.py
+import glob
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+class CommandJournal:
+    def __init__(self, directory="command_history", fsync_every=16, fsync_interval=1.0,
+                 segment_events=10000, history_size=100):
+        self.directory = directory
+        self.fsync_every = fsync_every          # fsync como mucho cada N eventos...
+        self.fsync_interval = fsync_interval    # ...o cada T segundos, lo que llegue antes
+        self.segment_events = segment_events    # Eventos por segmento antes de rotar y compactar
+        self.history_size = history_size
+        self.snapshot_path = os.path.join(directory, "snapshot.pkl")
+
+        # Estado consolidado en la instantánea: conteos (comando, hora) y últimos eventos
+        self.snapshot_segment = 0
+        self.snapshot_counts = Counter()
+        self.snapshot_recent = []
+
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread = None
+        self._file = None
+        self._segment = 0
+        self._segment_count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # Hilo que sincroniza la cola del diario aunque no lleguen más eventos
+        self._flusher = None
+        self._closed = threading.Event()
+        self._flush_wanted = threading.Event()  # append pide un fsync al llegar a fsync_every
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"journal.{number:06d}.log")
+
+    def segments(self):
+        numbers = []
+        for path in glob.glob(os.path.join(self.directory, "journal.*.log")):
+            try:
+                numbers.append(int(os.path.basename(path).split(".")[1]))
+            except ValueError:
+                continue
+        return sorted(numbers)
+
+    def exists(self):
+        return os.path.exists(self.snapshot_path) or bool(self.segments())
+
+    @staticmethod
+    def read_segment(path):
+        # Una línea por evento: "hora\tcomando\n"; se ignora una última línea incompleta tras un corte de energía
+        with open(path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    hour, command = raw.decode("utf-8").rstrip("\n").split("\t", 1)
+                    yield command, int(hour)
+                except (UnicodeDecodeError, ValueError):
+                    continue
+
+    def recover(self):
+        # Instantánea + cola del diario; devuelve (conteos, eventos recientes) y abre un segmento nuevo
+        with self._lock:
+            return self._recover()
+
+    def _recover(self):
+        if self._file is not None:
+            # Ya se escribió algo antes de recuperar (p. ej. un clic durante el arranque): se incluye
+            self._sync()
+            self._file.close()
+            self._file = None
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.snapshot_path):
+            import joblib
+            data = joblib.load(self.snapshot_path)
+            self.snapshot_segment = data["segment"]
+            self.snapshot_counts = Counter(data["counts"])
+            self.snapshot_recent = list(data["recent"])
+        counts = Counter(self.snapshot_counts)
+        recent = deque(self.snapshot_recent, maxlen=self.history_size)
+        segments = self.segments()
+        folded = [number for number in segments if number > self.snapshot_segment]
+        for number in folded:
+            for event in self.read_segment(self.segment_path(number)):
+                counts[event] += 1
+                recent.append(event)
+        last = max(segments + [self.snapshot_segment])
+        if folded:
+            # Lo reproducido pasa a la instantánea: el próximo arranque no vuelve a leer estos segmentos
+            self._wait_compaction()
+            self.write_snapshot(last, counts, list(recent))
+            for number in folded:
+                os.remove(self.segment_path(number))
+            logging.info(f"Diario de comandos compactado al recuperar ({len(folded)} segmentos).")
+        for number in segments:
+            if number <= self.snapshot_segment and number not in folded:
+                # Restos de una compactación interrumpida: ya están en la instantánea
+                os.remove(self.segment_path(number))
+        self._open_segment(last + 1)
+        return counts, list(recent)
+
+    def _wait_compaction(self):
+        thread = self._compact_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _open_segment(self, number):
+        self._segment = number
+        self._segment_count = 0
+        self._file = open(self.segment_path(number), "ab")
+        if self._flusher is None or not self._flusher.is_alive():
+            self._closed.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="journal-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        # Único responsable del fsync durante el funcionamiento normal: cada fsync_interval como mucho,
+        # o antes si append acumuló fsync_every eventos
+        while not self._closed.is_set():
+            self._flush_wanted.wait(self.fsync_interval)
+            self._flush_wanted.clear()
+            if self._closed.is_set():
+                break
+            try:
+                self._background_sync()
+            except OSError as e:
+                logging.error(f"Error al sincronizar el diario de comandos: {e}")
+
+    def _background_sync(self):
+        # El fsync se hace fuera del lock sobre un descriptor duplicado: append nunca espera al disco
+        with self._lock:
+            if self._file is None or not self._unsynced:
+                return
+            self._file.flush()
+            fd = os.dup(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, command, hour):
+        line = f"{hour}\t{command}\n".encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._recover()
+            self._file.write(line)
+            self.bytes_written += len(line)
+            self._unsynced += 1
+            self._segment_count += 1
+            if self._unsynced >= self.fsync_every:
+                self._flush_wanted.set()
+            if self._segment_count >= self.segment_events:
+                self._rotate()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def _rotate(self):
+        # Cerrar el segmento actual y compactar en segundo plano los segmentos cerrados
+        self._sync()
+        self._file.close()
+        sealed = self._segment
+        self._open_segment(sealed + 1)
+        self.compact_async(sealed)
+
+    def compact_async(self, upto):
+        with self._compact_lock:
+            if self._compact_thread is not None and self._compact_thread.is_alive():
+                return
+            self._compact_thread = threading.Thread(target=self.compact, args=(upto,), name="journal-compact", daemon=True)
+            self._compact_thread.start()
+
+    def compact(self, upto):
+        counts = Counter(self.snapshot_counts)
+        recent = deque(self.snapshot_recent, maxlen=self.history_size)
+        folded = [n for n in self.segments() if self.snapshot_segment < n <= upto]
+        for number in folded:
+            for event in self.read_segment(self.segment_path(number)):
+                counts[event] += 1
+                recent.append(event)
+        self.write_snapshot(upto, counts, list(recent))
+        for number in folded:
+            os.remove(self.segment_path(number))
+        logging.info(f"Diario de comandos compactado hasta el segmento {upto}.")
+
+    def write_snapshot(self, segment, counts, recent):
+        # Escritura atómica: archivo temporal + fsync + rename
+        import joblib
+        tmp_path = self.snapshot_path + ".tmp"
+        data = {"segment": segment, "counts": dict(counts), "recent": recent}
+        with open(tmp_path, "wb") as f:
+            joblib.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(self.directory, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self.bytes_written += os.path.getsize(self.snapshot_path)
+        self.snapshot_segment = segment
+        self.snapshot_counts = Counter(counts)
+        self.snapshot_recent = list(recent)
+
+    def close(self):
+        self._closed.set()
+        self._flush_wanted.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+        self._wait_compaction()
@@ -0,0 +1,81 @@
+# command_matcher.py
+import threading
+from collections import OrderedDict, defaultdict
+from fuzzywuzzy import fuzz, utils
+
+class CommandMatcher:
+    def __init__(self, commands, max_candidates=25, cache_size=256):
+        self.max_candidates = max_candidates  # Candidatos que se puntúan tras la poda por trigramas
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build(commands)
+
+    @staticmethod
+    def normalize(text):
+        # Mismo preprocesado que aplica fuzz.WRatio, para que las puntuaciones coincidan con extractOne
+        return utils.full_process(text, force_ascii=True)
+
+    @staticmethod
+    def trigrams(processed):
+        grams = set()
+        for token in processed.split():
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                grams.add(padded[i:i + 3])
+        return grams
+
+    def build(self, commands):
+        # Preprocesar e indexar la lista de comandos una sola vez
+        self.source = commands
+        self.size = len(commands)
+        self.commands = list(commands)
+        self.processed = [self.normalize(c) for c in self.commands]
+        index = defaultdict(list)
+        for i, processed in enumerate(self.processed):
+            for gram in self.trigrams(processed):
+                index[gram].append(i)
+        self.index = dict(index)
+        with self._lock:
+            self._cache.clear()
+
+    def is_stale(self, commands):
+        return commands is not self.source or len(commands) != self.size
+
+    def _candidates(self, processed_query):
+        overlap = defaultdict(int)
+        for gram in self.trigrams(processed_query):
+            for i in self.index.get(gram, ()):
+                overlap[i] += 1
+        if len(overlap) <= self.max_candidates:
+            return list(overlap)
+        return sorted(overlap, key=overlap.get, reverse=True)[:self.max_candidates]
+
+    def _ranked(self, query):
+        processed_query = self.normalize(query)
+        with self._lock:
+            ranked = self._cache.get(processed_query)
+            if ranked is not None:
+                self._cache.move_to_end(processed_query)
+                self.hits += 1
+                return ranked
+        self.misses += 1
+        ranked = []
+        if processed_query:
+            scored = [(self.commands[i], fuzz.WRatio(processed_query, self.processed[i]))
+                      for i in self._candidates(processed_query)]
+            ranked = sorted(scored, key=lambda item: item[1], reverse=True)
+        with self._lock:
+            self._cache[processed_query] = ranked
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return ranked
+
+    def extract_one(self, query):
+        ranked = self._ranked(query)
+        return ranked[0] if ranked else (None, 0)
+
+    def extract(self, query, limit=3):
+        return self._ranked(query)[:limit]
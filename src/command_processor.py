@@ -1,24 +1,96 @@
 # command_processor.py
+import json
 import time
 import logging
 from command_handler import CommandHandler
 
 class CommandProcessor:
+    # Palabras clave que preceden a un comando
+    default_keywords = ["control", "activar", "inicia", "inicio", "comando"]
+
+    # Palabras mínimas del prefijo para despachar desde un resultado parcial
+    min_prefix_words = 2
+    # El mismo comando de la misma fuente (reconocedor o sesión) dentro de esta ventana se ignora
+    repeat_window = 5.0
+    repeats_suppressed = 0
+
+    @staticmethod
+    def build_grammar(keyword_list):
+        # Vocabulario del modo gramática: palabras clave, comandos conocidos y "ayuda"
+        phrases = list(dict.fromkeys(list(keyword_list) + CommandHandler.commands_list + ["ayuda"]))
+        phrases.append("[unk]")
+        return json.dumps(phrases, ensure_ascii=False)
+
+    @staticmethod
+    def extract_command(recognized_text, keyword_list):
+        keyword_found = next((k for k in keyword_list if k in recognized_text), None)
+        if not keyword_found:
+            return None
+        return recognized_text.split(keyword_found, 1)[-1].strip()
+
     @staticmethod
     def process_command(recognized_text, recognizer):
         if "ayuda" in recognized_text:
             CommandHandler.display_help()
             return
-        keyword_found = next((k for k in recognizer.keyword_list if k in recognized_text), None)
-        if keyword_found:
-            command = recognized_text.split(keyword_found, 1)[-1].strip()
+        command = CommandProcessor.extract_command(recognized_text, recognizer.keyword_list)
+        if command is not None:
             matched_command = CommandHandler.get_best_match(command)
-            current_time = time.time()
-            if matched_command and (matched_command != recognizer.last_command_time or current_time - recognizer.last_command_time > 5):
-                recognizer.last_command_time = current_time
-                CommandHandler.execute_command(matched_command)
-                CommandHandler.schedule_training(matched_command, time.localtime().tm_hour)
-            else:
-                logging.info(f"Comando no reconocido o repetido: {command}")
+            if matched_command and matched_command == recognizer.early_command:
+                # Ya se ejecutó a partir del resultado parcial
+                logging.debug(f"Comando ya despachado anticipadamente: {matched_command}")
+                return
+            if not matched_command:
+                logging.info(f"Comando no reconocido: {command}")
                 # Fallback mechanism
                 CommandHandler.fallback_command(command)
+            elif CommandProcessor.is_repeat(matched_command, recognizer):
+                CommandProcessor.repeats_suppressed += 1
+                logging.info(f"Comando repetido ignorado: {matched_command}")
+            else:
+                CommandProcessor.remember(matched_command, recognizer)
+                CommandProcessor.dispatch(matched_command, recognizer)
+
+    @staticmethod
+    def is_repeat(matched_command, recognizer):
+        last_command = getattr(recognizer, "last_command", None)
+        return (matched_command == last_command
+                and time.monotonic() - recognizer.last_command_time <= CommandProcessor.repeat_window)
+
+    @staticmethod
+    def remember(matched_command, recognizer):
+        recognizer.last_command = matched_command
+        recognizer.last_command_time = time.monotonic()
+
+    @staticmethod
+    def process_partial(partial_text, recognizer):
+        # Despacho anticipado: palabra clave + prefijo que sólo corresponde a un comando
+        if recognizer.early_command:
+            return
+        command = CommandProcessor.extract_command(partial_text, recognizer.keyword_list)
+        if not command:
+            return
+        prefix = command.split()
+        if len(prefix) < CommandProcessor.min_prefix_words:
+            return
+        candidates = [c for c in CommandHandler.commands_list if c.split()[:len(prefix)] == prefix]
+        if len(candidates) != 1:
+            return
+        matched_command = candidates[0]
+        if CommandProcessor.is_repeat(matched_command, recognizer):
+            CommandProcessor.repeats_suppressed += 1
+            return
+        recognizer.early_command = matched_command
+        CommandProcessor.remember(matched_command, recognizer)
+        logging.info(f"Despacho anticipado desde resultado parcial: {matched_command}")
+        CommandProcessor.dispatch(matched_command, recognizer)
+
+    @staticmethod
+    def dispatch(matched_command, recognizer):
+        if recognizer.command_sink is not None:
+            # Ejecución delegada a otra etapa (runtime asyncio)
+            recognizer.command_sink(matched_command)
+            return
+        # Future del envío CAN (None si no hubo trama, p. ej. el dispositivo ya estaba en ese estado)
+        recognizer.dispatch_future = CommandHandler.execute_command(matched_command)
+        CommandHandler.schedule_training(matched_command, time.localtime().tm_hour)
@@ -0,0 +1,98 @@
+# command_registry.py
+from can_sender import CanSender
+
+class CommandSpec:
+    def __init__(self, name, device, state_key, value, build_frame, already_message=None, request_pgn=None):
+        self.name = name
+        self.device = device                    # Etiqueta del dispositivo en la GUI y en la ayuda
+        self.state_key = state_key
+        self.value = value                      # None: consulta, se envía siempre sin cambiar el estado
+        self.build_frame = build_frame          # Recibe el estado ya actualizado y devuelve (arbitration_id, data)
+        self.already_message = already_message
+        self.request_pgn = request_pgn          # Consultas J1939: PGN cuya respuesta trae el valor
+
+class Device:
+    def __init__(self, label, state_key, image, on_command=None, off_command=None, action_command=None):
+        self.label = label
+        self.state_key = state_key
+        self.image = image
+        self.on_command = on_command
+        self.off_command = off_command
+        self.action_command = action_command
+
+    @property
+    def toggle(self):
+        return self.on_command is not None
+
+    def command_for(self, active):
+        if not self.toggle:
+            return self.action_command
+        return self.on_command if active else self.off_command
+
+class CommandRegistry:
+    def __init__(self):
+        self.commands = {}
+        self.devices = []
+        # Lista compartida con CommandHandler.commands_list; se amplía en el mismo objeto
+        self.names = []
+
+    def register(self, spec):
+        if spec.name not in self.commands:
+            self.names.append(spec.name)
+        self.commands[spec.name] = spec
+
+    def register_device(self, device, *specs):
+        self.devices.append(device)
+        for spec in specs:
+            self.register(spec)
+
+    def get(self, name):
+        return self.commands.get(name)
+
+    def device_commands(self, label):
+        return [spec.name for spec in self.commands.values() if spec.device == label]
+
+def lights_frame(state):
+    return CanSender.lights_frame(exterior=state["luces_exteriores"], interior=state["luces_cabina"])
+
+def build_default_registry():
+    registry = CommandRegistry()
+    registry.register_device(
+        Device("Luces de Cabina", "luces_cabina", "src/assets/luz_conductor.png",
+               on_command="encender luces de cabina", off_command="apagar luces de cabina"),
+        CommandSpec("encender luces de cabina", "Luces de Cabina", "luces_cabina", True, lights_frame,
+                    "Las luces de cabina ya están encendidas."),
+        CommandSpec("apagar luces de cabina", "Luces de Cabina", "luces_cabina", False, lights_frame,
+                    "Las luces de cabina ya están apagadas."),
+    )
+    registry.register_device(
+        Device("Luces Exteriores", "luces_exteriores", "src/assets/light_car.png",
+               on_command="encender luces exteriores", off_command="apagar luces exteriores"),
+        CommandSpec("encender luces exteriores", "Luces Exteriores", "luces_exteriores", True, lights_frame,
+                    "Las luces exteriores ya están encendidas."),
+        CommandSpec("apagar luces exteriores", "Luces Exteriores", "luces_exteriores", False, lights_frame,
+                    "Las luces exteriores ya están apagadas."),
+    )
+    registry.register_device(
+        Device("Puerta", "puerta", "src/assets/puerta-img.png",
+               on_command="abrir puerta", off_command="cerrar puerta"),
+        CommandSpec("abrir puerta", "Puerta", "puerta", True,
+                    lambda state: CanSender.door_frame(True), "La puerta ya está abierta."),
+        CommandSpec("cerrar puerta", "Puerta", "puerta", False,
+                    lambda state: CanSender.door_frame(False), "La puerta ya está cerrada."),
+    )
+    registry.register_device(
+        Device("Nivel de Combustible", "nivel_combustible", "src/assets/level_fuel.png",
+               action_command="consultar nivel de combustible"),
+        CommandSpec("consultar nivel de combustible", "Nivel de Combustible", "nivel_combustible", None,
+                    lambda state: CanSender.fuel_level_request_frame(), request_pgn=0xFEFC),
+    )
+    registry.register_device(
+        Device("Motor", "motor", "src/assets/engine.png",
+               on_command="encender motor", off_command="apagar motor"),
+        CommandSpec("encender motor", "Motor", "motor", True,
+                    lambda state: CanSender.engine_frame(True), "El motor ya está encendido."),
+        CommandSpec("apagar motor", "Motor", "motor", False,
+                    lambda state: CanSender.engine_frame(False), "El motor ya está apagado."),
+    )
+    return registry
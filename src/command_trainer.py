@@ -0,0 +1,95 @@
+# command_trainer.py
+import copy
+import logging
+import queue
+import threading
+import numpy as np
+
+class BackgroundTrainer:
+    # Clases del modelo: hora del día en que se usa cada comando
+    hours = np.arange(24)
+
+    def __init__(self, n_features=2 ** 12, on_trained=None):
+        # scikit-learn tarda más de un segundo en importarse: se carga al entrenar por primera vez
+        self.n_features = n_features
+        self.vectorizer = None
+        self.model = None
+        self.on_trained = on_trained
+        self.updates = 0
+        # Serializa fit_initial y el hilo de fondo para que ninguna actualización pise a otra
+        self._model_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="command-trainer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=2.0):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, command, hour):
+        # Nunca bloquea: el entrenamiento se hace en el hilo de fondo
+        self.start()
+        self._queue.put((command, hour))
+
+    def fit_initial(self, commands, hours, sample_weight=None):
+        # Con conteos agregados (sample_weight) el coste no depende del número total de eventos
+        if commands:
+            self._update(list(commands), list(hours), sample_weight)
+
+    def predict_hour(self, command):
+        model = self.model
+        if not hasattr(model, "classes_"):
+            return None
+        return int(model.predict(self.vectorizer.transform([command]))[0])
+
+    def _ensure_model(self):
+        if self.model is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            from sklearn.naive_bayes import MultinomialNB
+            # Espacio de características fijo: no hay que reajustar el vectorizador al crecer el historial
+            self.vectorizer = HashingVectorizer(n_features=self.n_features, alternate_sign=False)
+            self.model = MultinomialNB()
+
+    def _update(self, commands, hours, sample_weight=None):
+        # Se entrena una copia y se publica con una sola asignación
+        with self._model_lock:
+            self._ensure_model()
+            model = copy.deepcopy(self.model)
+            X = self.vectorizer.transform(commands)
+            model.partial_fit(X, np.asarray(hours), classes=self.hours, sample_weight=sample_weight)
+            self.model = model
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = False
+            # Agrupar todo lo que se haya acumulado mientras se entrenaba
+            while item is not None:
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                stop = True
+            if batch:
+                try:
+                    commands, hours = zip(*batch)
+                    self._update(list(commands), list(hours))
+                    self.updates += 1
+                    if self.on_trained is not None:
+                        self.on_trained(len(batch))
+                except Exception as e:
+                    logging.error(f"Error al entrenar el modelo: {e}")
+            if stop:
+                break
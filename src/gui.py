@@ -1,11 +1,12 @@
 # gui.py
 import pygame
-import sys
+import time
+import logging
 from pygame.locals import *
 from command_handler import CommandHandler
 
 class GUI:
-    def __init__(self):
+    def __init__(self, render_mode="dirty", active_fps=60, idle_fps=10, stats_interval=30, on_first_frame=None):
         # Inicializar Pygame
         pygame.init()
 
@@ -18,108 +19,178 @@ class GUI:
         self.yellow = (252, 243, 0)   # Amarillo para indicar estado activo
         self.black = (0, 0, 0)
 
+        # Los botones se generan desde el registro de comandos
+        self.devices = {device.label: device for device in CommandHandler.registry.devices}
+
         # Obtener el estado inicial desde CommandHandler
-        self.button_status = {
-            "Luces de Cabina": CommandHandler.state["luces_cabina"],
-            "Luces Exteriores": CommandHandler.state["luces_exteriores"],
-            "Puerta": CommandHandler.state["puerta"],
-            "Nivel de Combustible": CommandHandler.state["nivel_combustible"],
-            "Motor": CommandHandler.state["motor"],
-            # Añade otros estados si es necesario
-        }
+        self.button_status = {}
+        self.state_version = -1
+        self.update_button_status()
 
         heightBox = 250
         widthBox = 220
-        # Definir las áreas de los botones
+        # Definir las áreas de los botones: rejilla de 3 columnas
         self.buttons = {
-            "Luces de Cabina": pygame.Rect(100, 50, widthBox, heightBox),
-            "Luces Exteriores": pygame.Rect(400, 50, widthBox, heightBox),
-            "Puerta": pygame.Rect(700, 50, widthBox, heightBox),
-            "Nivel de Combustible": pygame.Rect(100, 350, widthBox, heightBox),
-            "Motor": pygame.Rect(400, 350, widthBox, heightBox),
-            # Añade otros botones si es necesario
+            label: pygame.Rect(100 + 300 * (i % 3), 50 + 300 * (i // 3), widthBox, heightBox)
+            for i, label in enumerate(self.devices)
         }
 
-        # Cargar imágenes para los servicios
-        self.images = {
-            "Luces de Cabina": pygame.image.load('src/assets/luz_conductor.png'),
-            "Luces Exteriores": pygame.image.load('src/assets/light_car.png'),
-            "Puerta": pygame.image.load('src/assets/puerta-img.png'),
-            "Nivel de Combustible": pygame.image.load('src/assets/level_fuel.png'),
-            "Motor": pygame.image.load('src/assets/engine.png'),
-            # Añade otras imágenes si es necesario
-        }
+        # Cargar imágenes para los servicios, convertidas al formato de la pantalla para acelerar el blit
+        self.images = {label: pygame.image.load(device.image).convert_alpha() for label, device in self.devices.items()}
 
         # Cargar imagen de fondo
-        self.bg = pygame.image.load('src/assets/bg-interfaz-2.png')
+        self.bg = pygame.image.load('src/assets/bg-interfaz-2.png').convert()
 
-        # Fuente para el texto
+        # Fuente para el texto y caché de superficies ya renderizadas
         self.fuente = pygame.font.Font(None, 25)
+        self.text_cache = {}
+
+        # "dirty": sólo se repintan los botones que cambian; "full": redibujo completo a 60 FPS (modo anterior)
+        self.render_mode = render_mode
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.stats_interval = stats_interval
+        self.frame_count = 0
+        self.frame_time = 0.0
+        self.running = False
+        # Se llama una vez cuando el primer frame llega a la pantalla (medición del arranque)
+        self.on_first_frame = on_first_frame
+
+    def render_text(self, text):
+        surface = self.text_cache.get(text)
+        if surface is None:
+            surface = self.fuente.render(text, True, self.black)
+            self.text_cache[text] = surface
+        return surface
+
+    def draw_button(self, boton):
+        rect = self.buttons[boton]
+        toggle = self.devices[boton].toggle
+        color = self.yellow if toggle and self.button_status[boton] else self.white
+        pygame.draw.rect(self.screen, color, rect)
+        self.screen.blit(self.images[boton], (rect.x + 35, rect.y + 10))  # Dibujar la imagen del servicio
+        if not toggle:
+            # Consultas: sólo el valor del almacén de estado, vacío hasta la primera lectura real
+            value = self.button_status[boton]
+            is_reading = isinstance(value, (int, float)) and not isinstance(value, bool)
+            text_status = f"{value:.1f} %" if is_reading else ""
+        else:
+            text_status = "Encendido" if self.button_status[boton] else "Apagado"
+        self.screen.blit(self.render_text(text_status), (rect.x + 50, rect.y + 180))
+        self.screen.blit(self.render_text(boton.replace('_', ' ').title()), (rect.x + 20, rect.y + 200))
+        return rect
+
+    def draw_all(self):
+        self.screen.fill(self.white)
+        self.screen.blit(self.bg, (0, 0))
+        for boton in self.buttons:
+            self.draw_button(boton)
+
+    def handle_events(self):
+        # Devuelve los botones pulsados en este frame
+        clicked = set()
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                # Termina el bucle; quien llamó a run() se encarga de parar el resto del sistema
+                self.running = False
+            elif event.type == MOUSEBUTTONDOWN:
+                if event.button == 1:  # Clic izquierdo
+                    for button, rect in self.buttons.items():
+                        if rect.collidepoint(event.pos):
+                            # Sin cambio optimista: el botón se repinta desde el almacén de estado,
+                            # así refleja el resultado real aunque el comando no cambie nada
+                            self.execute_command_from_gui(button)
+                            clicked.add(button)
+        return clicked
 
-    # Dibujar los botones
-    def draw_buttons(self):
-        for boton, rect in self.buttons.items():
-            color = self.yellow if self.button_status[boton] else self.white
-            pygame.draw.rect(self.screen, color, rect)
-            image = self.images[boton]
-            self.screen.blit(image, (rect.x + 35, rect.y + 10))  # Dibujar la imagen del servicio
-            if (boton == "Nivel de Combustible"):
-                text_status = ""
+    def run(self):
+        self.running = True
+        try:
+            if self.render_mode == "full":
+                self.run_full()
             else:
-                text_status = "Encendido" if self.button_status[boton] else "Apagado"
-            text = self.fuente.render(f"{text_status}", True, self.black)
-            self.screen.blit(text, (rect.x + 50, rect.y + 180))
-            text_service = self.fuente.render(boton.replace('_', ' ').title(), True, self.black)
-            self.screen.blit(text_service, (rect.x + 20, rect.y + 200))
+                self.run_dirty()
+        finally:
+            pygame.quit()
 
-    def run(self):
+    def run_full(self):
         clock = pygame.time.Clock()
-        while True:
-            self.screen.fill(self.white)
-            self.screen.blit(self.bg, (0, 0))
-
-            # Actualizar el estado de los botones desde CommandHandler
+        last_report = time.monotonic()
+        cpu_start = time.process_time()
+        while self.running:
+            start = time.perf_counter()
+            # Actualizar el estado de los botones desde CommandHandler y dibujar todo
             self.update_button_status()
-
-            # Dibujar botones
-            self.draw_buttons()
-
-            # Manejar eventos
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == MOUSEBUTTONDOWN:
-                    if event.button == 1:  # Clic izquierdo
-                        for button, rect in self.buttons.items():
-                            if rect.collidepoint(event.pos):
-                                # Actualizar el estado y ejecutar el comando correspondiente
-                                self.button_status[button] = not self.button_status[button]
-                                self.execute_command_from_gui(button)
-
+            self.draw_all()
+            self.handle_events()
             pygame.display.update()
-            clock.tick(60)  # Limitar a 60 FPS
+            self.record_frame(time.perf_counter() - start)
+            self.first_frame_shown()
+            last_report, cpu_start = self.report_render_stats(last_report, cpu_start)
+            clock.tick(self.active_fps)
+
+    def run_dirty(self):
+        clock = pygame.time.Clock()
+        last_report = time.monotonic()
+        cpu_start = time.process_time()
+        self.update_button_status()
+        self.draw_all()
+        pygame.display.flip()
+        self.first_frame_shown()
+        while self.running:
+            start = time.perf_counter()
+            dirty = self.handle_events() | self.update_button_status()
+            if dirty:
+                # Repintar sólo los botones cambiados; el rectángulo del botón tapa el fondo por completo
+                rects = [self.draw_button(boton) for boton in dirty]
+                pygame.display.update(rects)
+                self.record_frame(time.perf_counter() - start)
+            last_report, cpu_start = self.report_render_stats(last_report, cpu_start)
+            # Con la pantalla estática basta con atender eventos a baja frecuencia
+            clock.tick(self.active_fps if dirty else self.idle_fps)
+
+    def first_frame_shown(self):
+        callback, self.on_first_frame = self.on_first_frame, None
+        if callback is not None:
+            callback()
+
+    def record_frame(self, elapsed):
+        self.frame_count += 1
+        self.frame_time += elapsed
+
+    def report_render_stats(self, last_report, cpu_start):
+        now = time.monotonic()
+        if now - last_report < self.stats_interval:
+            return last_report, cpu_start
+        cpu_now = time.process_time()
+        frame_ms = self.frame_time / self.frame_count * 1000 if self.frame_count else 0.0
+        cpu = (cpu_now - cpu_start) / (now - last_report) * 100
+        logging.info(f"Render ({self.render_mode}): {self.frame_count} frames dibujados, "
+                     f"{frame_ms:.2f} ms/frame, CPU del proceso {cpu:.1f}%")
+        self.frame_count = 0
+        self.frame_time = 0.0
+        return now, cpu_now
 
     def update_button_status(self):
-        # Actualizar el estado de los botones basándose en CommandHandler.state
-        self.button_status["Luces de Cabina"] = CommandHandler.state["luces_cabina"]
-        self.button_status["Luces Exteriores"] = CommandHandler.state["luces_exteriores"]
-        self.button_status["Puerta"] = CommandHandler.state["puerta"]
-        self.button_status["Nivel de Combustible"] = CommandHandler.state["nivel_combustible"]
-        self.button_status["Motor"] = CommandHandler.state["motor"]
-        # Actualiza otros estados si es necesario
+        # Actualizar el estado de los botones desde la instantánea del estado del vehículo
+        # Devuelve los botones cuyo estado cambió
+        version, state = CommandHandler.store.snapshot()
+        if version == self.state_version:
+            return set()
+        self.state_version = version
+        changed = set()
+        for label, device in self.devices.items():
+            value = state[device.state_key]
+            if self.button_status.get(label) != value or label not in self.button_status:
+                self.button_status[label] = value
+                changed.add(label)
+        return changed
 
     def execute_command_from_gui(self, button):
         # Mapear el botón a un comando de voz equivalente
-        command_map = {
-            "Luces de Cabina": "encender luces de cabina" if self.button_status[button] else "apagar luces de cabina",
-            "Luces Exteriores": "encender luces exteriores" if self.button_status[button] else "apagar luces exteriores",
-            "Puerta": "abrir puerta" if self.button_status[button] else "cerrar puerta",
-            "Nivel de Combustible": "consultar nivel de combustible",
-            "Motor": "encender motor" if self.button_status[button] else "apagar motor",
-            # Añade otros mapeos si es necesario
-        }
-        command = command_map.get(button)
+        device = self.devices.get(button)
+        # Los interruptores piden el estado contrario al actual; las consultas ignoran el argumento
+        command = device.command_for(not self.button_status[button]) if device else None
         if command:
             # Enviar el comando al CommandHandler
             CommandHandler.execute_command(command)
@@ -0,0 +1,159 @@
+# j1939_requests.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from can_sender import CanSender
+
+# PGN 65276 (Dash Display): nivel de combustible
+PGN_DASH_DISPLAY = 0xFEFC
+
+class PendingRequest:
+    def __init__(self, pgn, destination, timeout, retries):
+        self.pgn = pgn
+        self.destination = destination
+        self.timeout = timeout
+        self.retries_left = retries
+        self.attempts = 0
+        # Future interno, nunca se entrega: cada llamante recibe el suyo encadenado a éste,
+        # así cancelar uno no cancela la solicitud de los demás
+        self.future = Future()
+        self.timer = None
+
+    def attach(self):
+        caller = Future()
+        self.future.add_done_callback(lambda f: _deliver(f, caller))
+        return caller
+
+class J1939Requests:
+    # Solicitudes J1939 (PGN 59904) con Future: se resuelven cuando CanReceptor decodifica el PGN pedido.
+    # Varias peticiones simultáneas del mismo PGN comparten una sola trama; las respuestas recientes se
+    # sirven desde una caché con caducidad sin volver a preguntar al bus.
+    def __init__(self, sender=None, timeout=0.5, retries=2, ttl=2.0, watched=(PGN_DASH_DISPLAY,)):
+        self.sender = sender  # None: un CanSender por envío, como CommandHandler
+        self.timeout = timeout
+        self.retries = retries
+        self.ttl = ttl
+        # PGN cuyas tramas interesan a CanReceptor, aunque lleguen sin haberlas pedido
+        self.watched = set(watched)
+        self.pending = {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+        self.requests_sent = 0
+        self.retried = 0
+        self.timeouts = 0
+        self.cache_hits = 0
+        self.shared = 0     # Peticiones que se unieron a otra ya en curso
+
+    def request(self, pgn, destination=0xFF, timeout=None, retries=None, max_age=None):
+        # Devuelve un Future con las señales decodificadas de la respuesta (dict)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            self.watched.add(pgn)
+            cached = self.cache.get(pgn)
+            if cached is not None and time.monotonic() - cached[0] <= max_age:
+                self.cache_hits += 1
+                future = Future()
+                future.set_result(cached[1])
+                return future
+            pending = self.pending.get(pgn)
+            if pending is not None:
+                self.shared += 1
+                return pending.attach()
+            pending = PendingRequest(pgn, destination,
+                                     self.timeout if timeout is None else timeout,
+                                     self.retries if retries is None else retries)
+            self.pending[pgn] = pending
+            caller = pending.attach()
+        self._send(pending)
+        return caller
+
+    async def request_async(self, pgn, **options):
+        return await asyncio.wrap_future(self.request(pgn, **options))
+
+    def _send(self, pending):
+        pending.attempts += 1
+        self.requests_sent += 1
+        pending.timer = threading.Timer(pending.timeout, self._on_timeout, args=(pending,))
+        pending.timer.daemon = True
+        pending.timer.start()
+        sender = self.sender if self.sender is not None else CanSender()
+        sent = sender.send_message(*CanSender.request_frame(pending.pgn, pending.destination))
+        sent.add_done_callback(lambda f: self._on_sent(pending, f))
+
+    def _on_sent(self, pending, sent):
+        if sent.cancelled() or sent.exception() is not None:
+            error = sent.exception() if not sent.cancelled() else RuntimeError("envío cancelado")
+            self._finish(pending, exception=error)
+
+    def _on_timeout(self, pending):
+        with self._lock:
+            if self.pending.get(pending.pgn) is not pending:
+                return
+            retry = pending.retries_left > 0
+            if retry:
+                pending.retries_left -= 1
+                self.retried += 1
+        if retry:
+            logging.debug(f"Sin respuesta al PGN {pending.pgn:#06x}; reintento {pending.attempts}")
+            self._send(pending)
+            return
+        self.timeouts += 1
+        self._finish(pending, exception=TimeoutError(
+            f"Sin respuesta al PGN {pending.pgn:#06x} tras {pending.attempts} intentos"))
+
+    def _finish(self, pending, result=None, exception=None):
+        with self._lock:
+            if self.pending.get(pending.pgn) is not pending:
+                return
+            del self.pending[pending.pgn]
+        if pending.timer is not None:
+            pending.timer.cancel()
+        if exception is not None:
+            pending.future.set_exception(exception)
+        else:
+            pending.future.set_result(result)
+
+    def on_response(self, pgn, signals):
+        # Llamado por CanReceptor con las señales de cada trama de un PGN vigilado
+        result = dict(signals)
+        with self._lock:
+            self.cache[pgn] = (time.monotonic(), result)
+            pending = self.pending.get(pgn)
+        if pending is not None:
+            self._finish(pending, result=result)
+
+    def cached(self, pgn, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self.cache.get(pgn)
+        if entry is None or time.monotonic() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def get_stats(self):
+        return {
+            "requests_sent": self.requests_sent,
+            "retried": self.retried,
+            "timeouts": self.timeouts,
+            "cache_hits": self.cache_hits,
+            "shared": self.shared,
+            "in_flight": len(self.pending),
+        }
+
+    def cancel_all(self):
+        with self._lock:
+            pending = list(self.pending.values())
+        for request in pending:
+            self._finish(request, exception=TimeoutError("Solicitudes J1939 canceladas al cerrar"))
+
+def _deliver(source, caller):
+    # set_running_or_notify_cancel es atómico frente a cancel(): un llamante que ya canceló se omite
+    if not caller.set_running_or_notify_cancel():
+        return
+    if source.exception() is not None:
+        caller.set_exception(source.exception())
+    else:
+        caller.set_result(source.result())
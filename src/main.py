@@ -1,45 +1,120 @@
 # main.py
-import threading
+import time
+STARTED = time.perf_counter()  # Antes de los demás imports: la fase "import" se mide desde aquí
+
+import os
 import logging
+import concurrent.futures
+from startup import Startup
 from command_handler import CommandHandler
-from speech_recognizer import SpeechRecognizer
 from can_receptor import CanReceptor
-from gui import GUI
+from can_service import CanSenderService
+from tx_scheduler import TransmitScheduler
+from metrics import Metrics
 
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
-    CommandHandler.load_model()
+MODEL_PATH = "./model"
+# Espera máxima al cerrar por un arranque que ya está abriendo el audio
+LAUNCH_WAIT = 1.0
+
+def load_speech_model():
+    # vosk sólo se importa aquí, en un hilo de arranque
+    from speech_recognizer import SpeechRecognizer
+    return SpeechRecognizer.load_model(MODEL_PATH)
+
+def first_audio(startup):
+    # Tiempo hasta el primer frame de audio capturado: el sistema ya oye al conductor
+    startup.mark("primer_frame")
+    logging.info(f"Primer frame de audio a los {startup.marks['primer_frame'] * 1000:.0f} ms.")
 
-    # Crear instancia del receptor CAN
-    receptor = CanReceptor()
+def start_runtime(startup, receptor, speech_model, history):
+    # Espera a los modelos, abre el audio y lanza el runtime; el sistema queda listo para escuchar
+    from speech_recognizer import SpeechRecognizer
+    from runtime import Runtime
+    model = speech_model.result()
+    history.result()
+    if startup.cancelled.is_set():
+        # La ventana se cerró mientras cargaban los modelos: no se abre el audio
+        return None
+    with startup.phase("audio"):
+        recognizer = SpeechRecognizer(MODEL_PATH, vad_enabled=True, model=model)
+        recognizer.start_stream()
 
-    # Crear instancia de la GUI
-    gui = GUI()
+    # Captura, reconocimiento, emparejamiento, ejecución y CAN corren en el bucle asyncio de otro hilo
+    runtime = Runtime(recognizer, receptor, on_first_audio=lambda: first_audio(startup))
+    runtime_thread = runtime.run_in_thread()
+    startup.mark_ready()
+    return runtime, runtime_thread
+
+def report_startup_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.error(f"Error durante el arranque: {future.exception()}")
+
+def main():
+    startup = Startup(STARTED)
+    startup.record("import", startup.elapsed())
 
-    # Crear instancia del reconocedor de voz
-    recognizer = SpeechRecognizer("./model")
+    # DRIVEVOICE_METRICS=on | <puerto> | unix:<ruta>; sin la variable no se instrumenta nada
+    metrics = os.environ.get("DRIVEVOICE_METRICS")
+    if metrics:
+        Metrics.enable(endpoint=None if metrics == "on" else metrics)
 
-    # Iniciar el stream de audio
-    recognizer.start_stream()
+    # El modelo de voz y el historial se cargan en segundo plano mientras se levantan el bus CAN y la GUI
+    speech_model = startup.submit("modelo_voz", load_speech_model)
+    history = startup.submit("historial", CommandHandler.load_model)
 
-    # Crear hilo para el reconocedor de voz
-    recognizer_thread = threading.Thread(target=recognizer.listen)
+    with startup.phase("bus_can"):
+        receptor = CanReceptor(store=CommandHandler.store, requests=CommandHandler.requests)
+        CanSenderService.get()
 
-    # Iniciar el hilo del reconocedor de voz
-    recognizer_thread.start()
+    with startup.phase("gui"):
+        from gui import GUI
+        gui = GUI(on_first_frame=lambda: startup.mark("gui_visible"))
 
-    # Ejecutar el receptor CAN en un hilo aparte
-    receptor_thread = threading.Thread(target=receptor.receive)
-    receptor_thread.start()
+    launch = startup.submit("runtime", start_runtime, startup, receptor, speech_model, history)
+    launch.add_done_callback(report_startup_error)
+    launch_failed = False
 
-    # Ejecutar la interfaz gráfica en el hilo principal
-    gui.run()
+    try:
+        # Ejecutar la interfaz gráfica en el hilo principal
+        gui.run()
+    except KeyboardInterrupt:
+        logging.info("Sistema detenido.")
+    finally:
+        # Sin esperar a que terminen de cargar los modelos si la ventana se cerró durante el arranque
+        startup.cancel()
+        launched = None
+        try:
+            launched = launch.result(timeout=LAUNCH_WAIT)
+        except concurrent.futures.TimeoutError:
+            logging.info("Cerrado durante el arranque; no se espera a la carga de los modelos.")
+        except Exception:
+            launch_failed = True
+        runtime, runtime_thread = launched if launched is not None else (None, None)
+        startup.shutdown()
+        if runtime is not None:
+            runtime.stop()
+            runtime_thread.join(runtime.shutdown_deadline + 1.0)
 
-    # Esperar a que el hilo del reconocedor de voz termine (si es que lo hace)
-    recognizer_thread.join()
+    if runtime is None:
+        # Los hilos de carga no se pueden interrumpir: salir sin esperarlos. os._exit se salta atexit,
+        # así que se cierra aquí lo que ya esté abierto (tramas de clics en la GUI, diario del historial)
+        TransmitScheduler.shutdown_all()
+        CanSenderService.shutdown_all()
+        if history.done() and not history.cancelled() and history.exception() is None:
+            CommandHandler.shutdown()
+        if launch_failed:
+            logging.error("El arranque no se completó; se fuerza la salida.")
+        logging.shutdown()
+        os._exit(1 if launch_failed else 0)
+    if runtime_thread.is_alive() or not runtime.clean_exit:
+        # Algún hilo quedó bloqueado: salir igualmente dentro del plazo
+        logging.error("El cierre superó el plazo; se fuerza la salida.")
+        logging.shutdown()
+        os._exit(1)
 
 if __name__ == "__main__":
     main()
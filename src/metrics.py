@@ -0,0 +1,323 @@
+# metrics.py
+import bisect
+import functools
+import logging
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los buckets en segundos (de 50 us a 2.5 s)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.bounds = tuple(buckets)
+        # Arrays preasignados: un contador por bucket más el de desbordamiento (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Aproximación por el límite superior del bucket que alcanza el cuantil
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(self.bounds + (float("inf"),), self.counts)),
+        }
+
+
+class InstrumentedLock:
+    # Envuelve el mismo lock: se puede instalar y retirar aunque otro hilo lo tenga tomado
+    def __init__(self, lock, wait_histogram, contended_counter):
+        self.lock = lock
+        self.wait_histogram = wait_histogram
+        self.contended_counter = contended_counter
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        Metrics.increment(self.contended_counter)
+        start = time.monotonic()
+        acquired = self.lock.acquire(True, timeout)
+        self.wait_histogram.observe(time.monotonic() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class Metrics:
+    # Desactivado por defecto: sin instrumentar, los métodos originales se llaman sin ningún envoltorio
+    enabled = False
+    histograms = {}
+    counters = {}
+    counter_help = {}
+    _patches = []
+    _lock = threading.Lock()
+    _reporter = None
+    _reporter_stop = None
+    _server = None
+
+    @classmethod
+    def histogram(cls, name, help_text, buckets=LATENCY_BUCKETS):
+        histogram = cls.histograms.get(name)
+        if histogram is None:
+            histogram = cls.histograms[name] = Histogram(name, help_text, buckets)
+        return histogram
+
+    @classmethod
+    def counter(cls, name, help_text):
+        cls.counters.setdefault(name, 0)
+        cls.counter_help[name] = help_text
+
+    @classmethod
+    def increment(cls, name, amount=1):
+        cls.counters[name] += amount
+
+    @classmethod
+    def reset(cls):
+        for histogram in cls.histograms.values():
+            histogram.counts = [0] * len(histogram.counts)
+            histogram.sum = 0.0
+            histogram.count = 0
+        for name in cls.counters:
+            cls.counters[name] = 0
+
+    # --- Instrumentación ---
+
+    @classmethod
+    def enable(cls, log_interval=30.0, endpoint=None):
+        # endpoint: puerto TCP local (int) o "unix:/ruta/al/socket"
+        with cls._lock:
+            if cls.enabled:
+                return
+            cls._install()
+            cls.enabled = True
+        if log_interval:
+            cls.start_reporter(log_interval)
+        if endpoint is not None:
+            cls.serve(endpoint)
+        logging.info(f"Métricas activadas: {len(cls._patches)} puntos instrumentados.")
+
+    @classmethod
+    def disable(cls):
+        with cls._lock:
+            if not cls.enabled:
+                return
+            # Restaurar los atributos originales en orden inverso
+            for owner, name, original in reversed(cls._patches):
+                setattr(owner, name, original)
+            cls._patches = []
+            cls.enabled = False
+        cls.stop_reporter()
+        cls.stop_server()
+
+    @classmethod
+    def _patch(cls, owner, name, replacement):
+        cls._patches.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    @classmethod
+    def _time_method(cls, owner, name, histogram):
+        original = owner.__dict__[name]
+        if isinstance(original, (classmethod, staticmethod)):
+            kind, func = type(original), original.__func__
+        else:
+            kind, func = None, original
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.monotonic() - start)
+
+        cls._patch(owner, name, kind(timed) if kind else timed)
+
+    @classmethod
+    def _install(cls):
+        # Cada módulo se instrumenta sólo si se puede importar (p. ej. sin pygame no hay GUI)
+        try:
+            from audio_handler import AudioStreamHandler
+            cls._time_method(AudioStreamHandler, "read_stream",
+                             cls.histogram("audio_read_seconds", "Tiempo en read_stream"))
+            cls._time_method(AudioStreamHandler, "preprocess_audio",
+                             cls.histogram("audio_preprocess_seconds", "Tiempo en preprocess_audio"))
+        except ImportError as e:
+            logging.debug(f"Audio sin instrumentar: {e}")
+        try:
+            import vosk
+            cls._time_method(vosk.KaldiRecognizer, "AcceptWaveform",
+                             cls.histogram("vosk_accept_seconds", "Tiempo en AcceptWaveform"))
+        except ImportError as e:
+            logging.debug(f"Vosk sin instrumentar: {e}")
+
+        from command_handler import CommandHandler
+        from can_service import CanSenderService
+        cls._time_method(CommandHandler, "get_best_match",
+                         cls.histogram("command_match_seconds", "Tiempo en get_best_match"))
+        cls._time_method(CanSenderService, "__init__",
+                         cls.histogram("can_bus_setup_seconds", "Tiempo en abrir el bus CAN de transmisión"))
+        cls.counter("state_lock_contended_total", "Veces que state_lock estaba tomado por otro hilo")
+        wait = cls.histogram("state_lock_wait_seconds", "Espera para tomar state_lock cuando estaba ocupado")
+        cls._patch(CommandHandler, "state_lock",
+                   InstrumentedLock(CommandHandler.state_lock, wait, "state_lock_contended_total"))
+
+        try:
+            from gui import GUI
+        except ImportError as e:
+            logging.debug(f"GUI sin instrumentar: {e}")
+        else:
+            frames = cls.histogram("gui_frame_seconds", "Duración de los frames dibujados por la GUI")
+            record_frame = GUI.__dict__["record_frame"]
+
+            def record_gui_frame(self, elapsed):
+                frames.observe(elapsed)
+                return record_frame(self, elapsed)
+
+            cls._patch(GUI, "record_frame", record_gui_frame)
+
+    # --- Exportación ---
+
+    @classmethod
+    def snapshot(cls):
+        return {
+            "enabled": cls.enabled,
+            "histograms": {name: h.snapshot() for name, h in cls.histograms.items()},
+            "counters": dict(cls.counters),
+        }
+
+    @classmethod
+    def log_line(cls):
+        # Línea compacta: nombre=n/p50/p99 en ms por histograma, más los contadores
+        parts = []
+        for name, h in cls.histograms.items():
+            if h.count:
+                parts.append(f"{name.removesuffix('_seconds')}={h.count}/"
+                             f"{h.quantile(0.5) * 1000:g}/{h.quantile(0.99) * 1000:g}ms")
+        parts.extend(f"{name}={value}" for name, value in cls.counters.items() if value)
+        return " ".join(parts)
+
+    @classmethod
+    def prometheus_text(cls):
+        lines = []
+        for name, h in cls.histograms.items():
+            metric = f"drivevoice_{name}"
+            lines.append(f"# HELP {metric} {h.help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(h.bounds, h.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+            lines.append(f"{metric}_sum {h.sum:.9f}")
+            lines.append(f"{metric}_count {h.count}")
+        for name, value in cls.counters.items():
+            metric = f"drivevoice_{name}"
+            lines.append(f"# HELP {metric} {cls.counter_help.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def start_reporter(cls, interval):
+        if cls._reporter is not None:
+            return
+        cls._reporter_stop = threading.Event()
+
+        def report(stop):
+            while not stop.wait(interval):
+                line = cls.log_line()
+                if line:
+                    logging.info(f"Métricas: {line}")
+
+        cls._reporter = threading.Thread(target=report, args=(cls._reporter_stop,), name="metrics-log", daemon=True)
+        cls._reporter.start()
+
+    @classmethod
+    def stop_reporter(cls):
+        if cls._reporter is not None:
+            cls._reporter_stop.set()
+            cls._reporter = None
+
+    @classmethod
+    def serve(cls, endpoint):
+        # Sólo escucha en local: 127.0.0.1:<puerto> o un socket Unix
+        if cls._server is not None:
+            return cls._server
+        if isinstance(endpoint, str) and endpoint.startswith("unix:"):
+            path = endpoint[len("unix:"):]
+            if os.path.exists(path):
+                os.remove(path)
+            server = UnixHTTPServer(path, MetricsRequestHandler)
+        else:
+            server = ThreadingHTTPServer(("127.0.0.1", int(endpoint)), MetricsRequestHandler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        cls._server = server
+        logging.info(f"Métricas disponibles en {endpoint} (/metrics).")
+        return server
+
+    @classmethod
+    def stop_server(cls):
+        server, cls._server = cls._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            if isinstance(server, UnixHTTPServer) and os.path.exists(server.server_address):
+                os.remove(server.server_address)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = Metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # En un socket Unix la dirección del cliente es una cadena vacía
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        logging.debug(f"Métricas HTTP: {format % args}")
@@ -0,0 +1,35 @@
+# migrate_history.py
+# Convierte un command_history.pkl (joblib) en la instantánea del diario de comandos.
+# Uso: python src/migrate_history.py [command_history.pkl] [--journal-dir command_history]
+import argparse
+import os
+import logging
+from collections import Counter
+from command_journal import CommandJournal
+
+def migrate(pkl_path, journal):
+    import joblib
+    data = joblib.load(pkl_path)
+    events = list(zip(data['command_history'], data['time_history']))
+    journal.write_snapshot(0, Counter(events), events[-journal.history_size:])
+    return len(events)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pkl", nargs="?", default="command_history.pkl")
+    parser.add_argument("--journal-dir", default="command_history")
+    parser.add_argument("--force", action="store_true", help="sobrescribir un diario existente")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    journal = CommandJournal(args.journal_dir)
+    if journal.exists() and not args.force:
+        parser.error(f"ya existe un diario en {args.journal_dir}; usa --force para sobrescribirlo")
+    os.makedirs(args.journal_dir, exist_ok=True)
+    for number in journal.segments():
+        os.remove(journal.segment_path(number))
+    count = migrate(args.pkl, journal)
+    logging.info(f"Migrados {count} eventos de {args.pkl} a {args.journal_dir}.")
+
+if __name__ == "__main__":
+    main()
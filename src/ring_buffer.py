@@ -0,0 +1,82 @@
+# ring_buffer.py
+import threading
+
+class AudioRingBuffer:
+    def __init__(self, capacity):
+        # Buffer de bytes de tamaño fijo, reservado una sola vez
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read_pos = 0
+        self._size = 0
+        self._cond = threading.Condition()
+
+        # Contadores para detectar cuándo el decodificador se queda atrás
+        self.overflows = 0
+        self.overflow_bytes = 0
+        self.underruns = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return self._size
+
+    def write(self, data):
+        n = len(data)
+        with self._cond:
+            if n > self.capacity:
+                # Sólo cabe la parte más reciente
+                data = data[-self.capacity:]
+                self.overflow_bytes += n - self.capacity
+                n = self.capacity
+            free = self.capacity - self._size
+            if n > free:
+                # Se descartan los datos más antiguos para conservar el audio reciente
+                dropped = n - free
+                self._read_pos = (self._read_pos + dropped) % self.capacity
+                self._size -= dropped
+                self.overflows += 1
+                self.overflow_bytes += dropped
+            write_pos = (self._read_pos + self._size) % self.capacity
+            first = min(n, self.capacity - write_pos)
+            self._view[write_pos:write_pos + first] = data[:first]
+            if first < n:
+                self._view[0:n - first] = data[first:n]
+            self._size += n
+            if self._size > self.max_depth:
+                self.max_depth = self._size
+            self._cond.notify()
+
+    def read(self, n, timeout=None):
+        # Espera hasta tener n bytes; si vence el timeout devuelve lo disponible (subdesbordamiento)
+        with self._cond:
+            if self._size < n:
+                self._cond.wait_for(lambda: self._size >= n, timeout)
+            if self._size < n:
+                self.underruns += 1
+                n = self._size
+            if n == 0:
+                return b""
+            first = min(n, self.capacity - self._read_pos)
+            data = bytes(self._view[self._read_pos:self._read_pos + first])
+            if first < n:
+                data += bytes(self._view[0:n - first])
+            self._read_pos = (self._read_pos + n) % self.capacity
+            self._size -= n
+            return data
+
+    def clear(self):
+        with self._cond:
+            self._read_pos = 0
+            self._size = 0
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "overflows": self.overflows,
+                "overflow_bytes": self.overflow_bytes,
+                "underruns": self.underruns,
+                "depth": self._size,
+                "max_depth": self.max_depth,
+                "capacity": self.capacity,
+            }
@@ -0,0 +1,227 @@
+# runtime.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from command_handler import CommandHandler
+from command_processor import CommandProcessor
+from can_service import CanSenderService
+from tx_scheduler import TransmitScheduler
+
+class Runtime:
+    def __init__(self, recognizer, receptor, audio_queue_size=32, text_queue_size=16,
+                 command_queue_size=16, tx_queue_size=64, tx_timeout=1.0, shutdown_deadline=3.0, stats_tick=1.0,
+                 on_first_audio=None):
+        self.recognizer = recognizer
+        self.receptor = receptor
+        self.queue_sizes = {
+            "audio": audio_queue_size,
+            "text": text_queue_size,
+            "command": command_queue_size,
+            "tx": tx_queue_size,
+        }
+        self.tx_timeout = tx_timeout
+        self.shutdown_deadline = shutdown_deadline
+        self.stats_tick = stats_tick  # report_capture_stats limita por sí mismo a stats_interval
+        # Se llama una vez con el primer chunk capturado (medición del arranque)
+        self.on_first_audio = on_first_audio
+
+        # Un ejecutor de un solo hilo por llamada bloqueante: PyAudio, Vosk y el bus CAN
+        self.executors = {
+            "capture": ThreadPoolExecutor(1, thread_name_prefix="rt-capture"),
+            "decode": ThreadPoolExecutor(1, thread_name_prefix="rt-decode"),
+            "can-rx": ThreadPoolExecutor(1, thread_name_prefix="rt-can-rx"),
+            # Historial y entrenamiento: la escritura del diario no corre en el bucle
+            "history": ThreadPoolExecutor(1, thread_name_prefix="rt-history"),
+        }
+        self.counters = {
+            "audio_dropped": 0,
+            "commands_dropped": 0,
+            "frames_dropped": 0,
+            "frames_sent": 0,
+            "frames_failed": 0,
+            "frames_received": 0,
+        }
+        self.loop = None
+        self._stop_event = None
+        self._started = threading.Event()
+        self._pending_texts = []
+        # False si alguna llamada bloqueante siguió viva tras el plazo de cierre
+        self.clean_exit = True
+
+    # --- Control desde otros hilos ---
+
+    def run_in_thread(self):
+        thread = threading.Thread(target=self._thread_main, name="runtime")
+        thread.start()
+        self._started.wait()
+        return thread
+
+    def _thread_main(self):
+        try:
+            asyncio.run(self.run())
+        except Exception as e:
+            self.clean_exit = False
+            logging.error(f"Error en el runtime: {e}")
+        finally:
+            self._started.set()
+
+    def stop(self):
+        if self.loop is not None and self._stop_event is not None:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+
+    # --- Ciclo de vida ---
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self.audio_queue = asyncio.Queue(self.queue_sizes["audio"])
+        self.text_queue = asyncio.Queue(self.queue_sizes["text"])
+        self.command_queue = asyncio.Queue(self.queue_sizes["command"])
+        self.tx_queue = asyncio.Queue(self.queue_sizes["tx"])
+
+        # El reconocedor entrega el texto a la cola y los comandos a la etapa de ejecución
+        self.recognizer.text_handler = lambda text, final: self._pending_texts.append((text, final))
+        self.recognizer.command_sink = self._submit_command
+
+        self.recognizer.start_stream()
+        self.receptor.start()
+        tasks = [
+            asyncio.create_task(self.capture_stage(), name="capture"),
+            asyncio.create_task(self.recognition_stage(), name="recognition"),
+            asyncio.create_task(self.matching_stage(), name="matching"),
+            asyncio.create_task(self.execution_stage(), name="execution"),
+            asyncio.create_task(self.transmit_stage(), name="can-tx"),
+            asyncio.create_task(self.receive_stage(), name="can-rx"),
+            asyncio.create_task(self.stats_stage(), name="stats"),
+        ]
+        self._started.set()
+        logging.info("Runtime iniciado.")
+        try:
+            stop_wait = asyncio.create_task(self._stop_event.wait())
+            done, _ = await asyncio.wait(tasks + [stop_wait], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stop_wait and not task.cancelled() and task.exception():
+                    logging.error(f"La etapa {task.get_name()} terminó con error: {task.exception()}")
+        finally:
+            await self.shutdown(tasks)
+
+    async def shutdown(self, tasks):
+        deadline = time.monotonic() + self.shutdown_deadline
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        # Esperar a que terminen las llamadas bloqueantes en curso antes de cerrar audio y bus
+        for name, executor in self.executors.items():
+            # El historial pendiente se escribe igualmente: son eventos ya aplicados al vehículo
+            executor.shutdown(wait=False, cancel_futures=name != "history")
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._join_executors), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.clean_exit = False
+            logging.warning("Alguna llamada bloqueante no terminó dentro del plazo de cierre.")
+        self.recognizer.audio_handler.close_stream()
+        self.receptor.close()
+        TransmitScheduler.shutdown_all(timeout=max(0.1, deadline - time.monotonic()))
+        CanSenderService.shutdown_all(timeout=max(0.1, deadline - time.monotonic()))
+        CommandHandler.shutdown()
+        logging.info(f"Runtime detenido. Contadores: {self.counters}")
+
+    def _join_executors(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+    # --- Políticas de cola ---
+
+    def _put_drop_oldest(self, queue, item, counter):
+        # Para audio en tiempo real: mejor perder lo más antiguo que bloquear la captura
+        if queue.full():
+            queue.get_nowait()
+            self.counters[counter] += 1
+        queue.put_nowait(item)
+
+    def _submit_command(self, command):
+        # Llamado desde la etapa de emparejamiento (hilo del bucle)
+        if self.command_queue.full():
+            self.counters["commands_dropped"] += 1
+            logging.warning(f"Cola de comandos llena; se descarta: {command}")
+            return
+        # Fin de voz y modo de despacho se toman ahora: al enviar la trama el reconocedor ya siguió adelante
+        mode = "early" if self.recognizer.early_command == command else "final"
+        self.command_queue.put_nowait((command, (self.recognizer.vad.last_voice_time, mode)))
+
+    # --- Etapas ---
+
+    async def capture_stage(self):
+        executor = self.executors["capture"]
+        while True:
+            data = await self.loop.run_in_executor(executor, self.recognizer.audio_handler.read_stream)
+            if data and self.on_first_audio is not None:
+                on_first_audio, self.on_first_audio = self.on_first_audio, None
+                on_first_audio()
+            if data:
+                self._put_drop_oldest(self.audio_queue, data, "audio_dropped")
+
+    async def recognition_stage(self):
+        executor = self.executors["decode"]
+        while True:
+            data = await self.audio_queue.get()
+            await self.loop.run_in_executor(executor, self.recognizer.decode, data)
+            # Contrapresión: si el emparejamiento va lento, la decodificación espera aquí
+            texts, self._pending_texts = self._pending_texts, []
+            for item in texts:
+                await self.text_queue.put(item)
+
+    async def matching_stage(self):
+        while True:
+            text, final = await self.text_queue.get()
+            if final:
+                self.recognizer.finish_utterance(text)
+            else:
+                CommandProcessor.process_partial(text, self.recognizer)
+
+    async def execution_stage(self):
+        while True:
+            command, latency = await self.command_queue.get()
+            frame = CommandHandler.apply_command(command)
+            # Sin esperar: un solo hilo mantiene el orden de los eventos en el diario
+            self.loop.run_in_executor(self.executors["history"], CommandHandler.schedule_training,
+                                      command, time.localtime().tm_hour)
+            if frame is not None:
+                await self.tx_queue.put((frame, latency))
+
+    async def transmit_stage(self):
+        service = TransmitScheduler.get()
+        in_flight = set()
+        while True:
+            (arbitration_id, data), (voice_end, mode) = await self.tx_queue.get()
+            future = service.submit(arbitration_id, data)
+            self.recognizer.track_latency(future, voice_end, mode)
+            # Sin esperar aquí: el planificador puede fusionar la trama con las siguientes del mismo PGN
+            task = asyncio.create_task(self._await_frame(future, arbitration_id))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    async def _await_frame(self, future, arbitration_id):
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), self.tx_timeout)
+            self.counters["frames_sent"] += 1
+        except asyncio.TimeoutError:
+            self.counters["frames_dropped"] += 1
+            logging.warning(f"Tiempo agotado al enviar la trama {hex(arbitration_id)}")
+        except Exception as e:
+            self.counters["frames_failed"] += 1
+            logging.error(f"Error al enviar la trama {hex(arbitration_id)}: {e}")
+
+    async def stats_stage(self):
+        # Estadísticas periódicas de captura, VAD y latencia, como en SpeechRecognizer.listen
+        while True:
+            await asyncio.sleep(self.stats_tick)
+            self.recognizer.report_capture_stats()
+
+    async def receive_stage(self):
+        executor = self.executors["can-rx"]
+        while True:
+            count = await self.loop.run_in_executor(executor, self.receptor.process_batch, 0.2)
+            self.counters["frames_received"] += count
@@ -1,20 +1,68 @@
 # speech_recognizer.py
-import vosk
 import json
+import time
 import logging
 from collections import deque
 from audio_handler import AudioStreamHandler
+from voice_activity import VoiceActivityDetector, VoiceActivityGate
 from command_processor import CommandProcessor
+from command_handler import CommandHandler
+from utterance_decoder import UtteranceDecoder
 
 class SpeechRecognizer:
-    def __init__(self, model_path, rate=16000, keyword_list=None):
-        self.model = vosk.Model(model_path)
+    def __init__(self, model_path, rate=16000, keyword_list=None, capture_mode="blocking", stats_interval=30,
+                 vad_enabled=False, vad_energy_threshold=300.0, vad_zcr_range=(0.02, 0.5),
+                 preroll_chunks=4, hangover_chunks=8, grammar_mode=False,
+                 early_dispatch=False, measure_latency=False, audio_stream=None, model=None):
+        import vosk
+        # Se puede pasar un vosk.Model ya cargado (p. ej. en segundo plano durante el arranque)
+        self.model = model if model is not None else self.load_model(model_path)
         self.rate = rate
-        self.recognizer = vosk.KaldiRecognizer(self.model, self.rate)
-        self.audio_buffer = deque(maxlen=2)
+        self.audio_buffer = deque(maxlen=preroll_chunks)
+        self.last_command = None
         self.last_command_time = 0
-        self.keyword_list = keyword_list if keyword_list else ["control", "activar", "inicia", "inicio", "comando"]
-        self.audio_handler = AudioStreamHandler(rate=self.rate)
+        self.keyword_list = keyword_list if keyword_list else list(CommandProcessor.default_keywords)
+
+        # Modo gramática: el decodificador sólo considera palabras clave y comandos conocidos
+        self.grammar_mode = grammar_mode
+        self._grammar_source = None
+        if self.grammar_mode:
+            self.recognizer = vosk.KaldiRecognizer(self.model, self.rate, self.build_grammar())
+        else:
+            self.recognizer = vosk.KaldiRecognizer(self.model, self.rate)
+        self.audio_handler = AudioStreamHandler(rate=self.rate, capture_mode=capture_mode, stream=audio_stream)
+        self.stats_interval = stats_interval
+        self._last_stats_time = time.monotonic()
+        self._last_overflows = 0
+
+        # Detector de actividad de voz: sólo se pasa audio a Vosk alrededor de los segmentos de voz
+        self.vad_enabled = vad_enabled
+        self.vad = VoiceActivityGate(
+            VoiceActivityDetector(energy_threshold=vad_energy_threshold,
+                                  zcr_min=vad_zcr_range[0], zcr_max=vad_zcr_range[1]),
+            self.audio_buffer,
+            hangover_chunks=hangover_chunks
+        )
+        self.accepted_chunks = 0
+        self.accept_cpu_time = 0.0
+
+        # Despacho anticipado desde PartialResult() y medición de latencia fin de voz -> envío CAN
+        self.early_dispatch = early_dispatch
+        self.early_command = None
+        self.dispatch_future = None
+        self._last_partial = ""
+        self.measure_latency = measure_latency
+        self.latencies = {"final": deque(maxlen=200), "early": deque(maxlen=200)}
+
+        # Si se asignan, el texto reconocido y los comandos se entregan a otra etapa en vez de procesarse aquí.
+        # text_handler(texto, es_final) se llama desde el hilo que decodifica; command_sink(comando) desde quien despacha.
+        self.text_handler = None
+        self.command_sink = None
+
+    @staticmethod
+    def load_model(model_path):
+        import vosk
+        return vosk.Model(model_path)
 
     def start_stream(self):
         self.audio_handler.start_stream()
@@ -23,19 +71,143 @@ class SpeechRecognizer:
         try:
             while True:
                 self.process_audio()
+                self.report_capture_stats()
         except KeyboardInterrupt:
             logging.info("Sistema detenido.")
         finally:
             self.audio_handler.close_stream()
 
+    def report_capture_stats(self):
+        now = time.monotonic()
+        if now - self._last_stats_time < self.stats_interval:
+            return
+        self._last_stats_time = now
+        if self.vad_enabled:
+            logging.info(f"Estadísticas VAD: {self.get_vad_stats()}")
+        if self.measure_latency:
+            logging.info(f"Latencia fin de voz -> envío CAN: {self.get_latency_stats()}")
+        if self.audio_handler.ring_buffer is None:
+            return
+        stats = self.audio_handler.get_capture_stats()
+        overflows = stats["overflows"] + stats["input_overflows"]
+        if overflows > self._last_overflows:
+            logging.warning(f"El decodificador se está quedando atrás: {stats}")
+        else:
+            logging.info(f"Estadísticas de captura: {stats}")
+        self._last_overflows = overflows
+
+    def get_capture_stats(self):
+        return self.audio_handler.get_capture_stats()
+
+    def build_grammar(self):
+        self._grammar_source = (tuple(self.keyword_list), tuple(CommandHandler.commands_list))
+        return CommandProcessor.build_grammar(self.keyword_list)
+
+    def refresh_grammar(self):
+        # Reconstruir la gramática si cambió la lista de comandos o de palabras clave
+        if not self.grammar_mode:
+            return
+        if self._grammar_source == (tuple(self.keyword_list), tuple(CommandHandler.commands_list)):
+            return
+        self.recognizer.SetGrammar(self.build_grammar())
+        logging.info("Gramática del reconocedor actualizada.")
+
+    def get_vad_stats(self):
+        avg_cpu = self.accept_cpu_time / self.accepted_chunks if self.accepted_chunks else 0.0
+        skipped = self.vad.total_chunks - self.vad.passed_chunks
+        return {
+            "chunks": self.vad.total_chunks,
+            "skipped_chunks": skipped,
+            "skipped_fraction": round(self.vad.skipped_fraction, 3),
+            "accept_cpu_ms": round(avg_cpu * 1000, 3),
+            "cpu_saved_s": round(avg_cpu * skipped, 3),
+        }
+
+    def record_latency(self):
+        # Negativa en modo anticipado cuando la trama sale antes de terminar de hablar
+        self.track_latency(self.dispatch_future, self.vad.last_voice_time,
+                           "early" if self.early_command else "final")
+
+    def track_latency(self, future, voice_end, mode):
+        # También la usa el runtime, que envía la trama en otra etapa
+        if not self.measure_latency or future is None or voice_end is None:
+            return
+
+        def on_sent(f):
+            # Las consultas se resuelven con señales, no con la trama enviada
+            if not f.cancelled() and f.exception() is None and hasattr(f.result(), "timestamp"):
+                self.latencies[mode].append(f.result().timestamp - voice_end)
+
+        future.add_done_callback(on_sent)
+
+    def get_latency_stats(self):
+        stats = {}
+        for mode, values in self.latencies.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            stats[mode] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+            }
+        return stats
+
     def process_audio(self):
         data = self.audio_handler.read_stream()
         if not data:
             return
+        self.decode(data)
+
+    def decode(self, data):
+        if not self.vad_enabled:
+            if self.measure_latency and self.vad.detector.is_speech(data):
+                self.vad.last_voice_time = time.time()
+            self.accept_chunk(data)
+            return
+        chunks, segment_ended = self.vad.push(data)
+        for chunk in chunks:
+            self.accept_chunk(chunk)
+        if segment_ended:
+            # Fin del segmento de voz: forzar el resultado final en lugar de esperar más silencio
+            self.handle_result(self.recognizer.FinalResult())
+
+    def accept_chunk(self, data):
         processed_data = self.audio_handler.preprocess_audio(data)
-        if self.recognizer.AcceptWaveform(processed_data):
-            result_json = self.recognizer.Result()
-            result = json.loads(result_json)
-            recognized_text = result.get("text", "").lower().strip()
-            if recognized_text:
-                CommandProcessor.process_command(recognized_text, self)
+        start = time.thread_time()
+        accepted = self.recognizer.AcceptWaveform(processed_data)
+        self.accept_cpu_time += time.thread_time() - start
+        self.accepted_chunks += 1
+        if accepted:
+            self.handle_result(self.recognizer.Result())
+        elif self.early_dispatch:
+            self.handle_partial(self.recognizer.PartialResult())
+
+    def handle_partial(self, partial_json):
+        partial_text = json.loads(partial_json).get("partial", "")
+        if partial_text == self._last_partial:
+            return
+        self._last_partial = partial_text
+        if not partial_text:
+            return
+        if self.text_handler is not None:
+            self.text_handler(partial_text.lower(), False)
+        else:
+            CommandProcessor.process_partial(partial_text.lower(), self)
+
+    def handle_result(self, result_json):
+        recognized_text = UtteranceDecoder.clean_text(result_json)
+        self._last_partial = ""
+        if self.text_handler is not None:
+            self.text_handler(recognized_text, True)
+        else:
+            self.finish_utterance(recognized_text)
+        # Entre enunciados es seguro cambiar la gramática
+        self.refresh_grammar()
+
+    def finish_utterance(self, recognized_text):
+        if recognized_text:
+            CommandProcessor.process_command(recognized_text, self)
+        self.record_latency()
+        self.early_command = None
+        self.dispatch_future = None
@@ -0,0 +1,306 @@
+# speech_service.py
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from audio_gain import AutomaticGainControl
+from audio_sources import SocketSource
+from voice_activity import VoiceActivityDetector, VoiceActivityGate
+from command_processor import CommandProcessor
+from utterance_decoder import UtteranceDecoder
+
+# Marca de fin de audio en la cola de una sesión
+END_OF_STREAM = None
+
+class RecognitionSession:
+    # Estado de un flujo de audio: reconocedor propio, AGC, VAD y cola de chunks pendientes.
+    # Expone los mismos atributos que SpeechRecognizer para poder pasar por CommandProcessor.
+    def __init__(self, session_id, service, source, recognizer, keyword_list=None, on_text=None,
+                 command_sink=None, max_pending_chunks=64):
+        self.session_id = session_id
+        self.service = service
+        self.source = source
+        self.recognizer = recognizer
+        self.keyword_list = keyword_list if keyword_list else list(CommandProcessor.default_keywords)
+        self.on_text = on_text
+        self.command_sink = command_sink
+        self.early_command = None
+        self.last_command = None
+        self.last_command_time = 0
+        self.dispatch_future = None
+
+        self.agc = AutomaticGainControl()
+        self.audio_buffer = deque(maxlen=service.preroll_chunks)
+        self.vad = VoiceActivityGate(VoiceActivityDetector(), self.audio_buffer,
+                                     hangover_chunks=service.hangover_chunks)
+        self.decoder = UtteranceDecoder(recognizer, self.vad if service.vad_enabled else None, self.agc,
+                                        on_text=self.handle_text)
+
+        # Cola propia y acotada: una sesión lenta no retiene audio de las demás
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.max_pending_chunks = max_pending_chunks
+        self.scheduled = False   # Ya está en la cola de listas o la tiene un worker
+        self.closed = False
+        self.done = threading.Event()
+        self.reader = None
+
+        self.chunks = 0
+        self.dropped = 0
+        self.audio_s = 0.0
+        self.decode_s = 0.0
+        self.lags = deque(maxlen=500)  # Espera en cola de cada chunk antes de decodificarse
+        self.texts = []
+
+    def feed(self, data):
+        # Llamado por el lector de la fuente; nunca bloquea
+        self.service.enqueue(self, (time.monotonic(), data))
+
+    def end(self):
+        self.service.enqueue(self, (time.monotonic(), END_OF_STREAM), force=True)
+
+    def decode(self, data):
+        start = time.monotonic()
+        self.decoder.push(data)
+        self.decode_s += time.monotonic() - start
+        self.audio_s += len(data) / 2 / self.service.rate
+        self.chunks += 1
+
+    def handle_text(self, text):
+        self.texts.append(text)
+        if self.on_text is not None:
+            self.on_text(self, text)
+        else:
+            CommandProcessor.process_command(text, self)
+        self.early_command = None
+        self.dispatch_future = None
+
+    def get_stats(self):
+        ordered = sorted(self.lags)
+        return {
+            "session": self.session_id,
+            "chunks": self.chunks,
+            "dropped": self.dropped,
+            "audio_s": round(self.audio_s, 2),
+            "rtf": round(self.decode_s / self.audio_s, 4) if self.audio_s else None,
+            "lag_p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            "lag_p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else None,
+            "pending": len(self.pending),
+        }
+
+
+class SpeechService:
+    # Un único vosk.Model compartido por todas las sesiones; cada sesión usa un KaldiRecognizer del pool.
+    # Vosk libera el GIL al decodificar, así que los workers aprovechan varios núcleos.
+    def __init__(self, model_path="./model", model=None, rate=16000, workers=None, chunk_size=1024,
+                 quantum=2, max_pending_chunks=64, recognizer_pool_size=8, grammar_mode=False,
+                 vad_enabled=True, preroll_chunks=4, hangover_chunks=8):
+        if model is None:
+            # vosk directamente: el servicio no abre el micrófono y no debe depender de pyaudio
+            import vosk
+            model = vosk.Model(model_path)
+        self.model = model
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.quantum = quantum  # Chunks por turno antes de ceder el worker a otra sesión
+        self.max_pending_chunks = max_pending_chunks
+        self.recognizer_pool_size = recognizer_pool_size
+        self.grammar = self.build_grammar() if grammar_mode else None
+        self.vad_enabled = vad_enabled
+        self.preroll_chunks = preroll_chunks
+        self.hangover_chunks = hangover_chunks
+
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._idle_recognizers = []
+        self._pool_lock = threading.Lock()
+        self._next_id = 0
+
+        # Cola FIFO de sesiones con audio pendiente: reparto por turnos entre sesiones
+        self._ready = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"speech-worker-{i}", daemon=True)
+            for i in range(workers or os.cpu_count() or 1)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._listener = None
+        self.closed = False
+
+    @staticmethod
+    def build_grammar():
+        return CommandProcessor.build_grammar(CommandProcessor.default_keywords)
+
+    # --- Pool de reconocedores ---
+
+    def _acquire_recognizer(self):
+        with self._pool_lock:
+            if self._idle_recognizers:
+                return self._idle_recognizers.pop()
+        import vosk
+        if self.grammar:
+            return vosk.KaldiRecognizer(self.model, self.rate, self.grammar)
+        return vosk.KaldiRecognizer(self.model, self.rate)
+
+    def _release_recognizer(self, recognizer):
+        recognizer.Reset()
+        with self._pool_lock:
+            if len(self._idle_recognizers) < self.recognizer_pool_size:
+                self._idle_recognizers.append(recognizer)
+
+    # --- Sesiones ---
+
+    def open_session(self, source, keyword_list=None, on_text=None, command_sink=None, session_id=None):
+        # source: cualquier objeto con read(num_frames) y close() (WavFileStream, MicrophoneSource, SocketSource)
+        recognizer = self._acquire_recognizer()
+        with self._sessions_lock:
+            if session_id is None:
+                session_id = f"s{self._next_id}"
+                self._next_id += 1
+            session = RecognitionSession(session_id, self, source, recognizer,
+                                         keyword_list=keyword_list, on_text=on_text, command_sink=command_sink,
+                                         max_pending_chunks=self.max_pending_chunks)
+            self.sessions[session_id] = session
+        session.reader = threading.Thread(target=self._read_source, args=(session,),
+                                          name=f"speech-source-{session_id}", daemon=True)
+        session.reader.start()
+        logging.info(f"Sesión de voz {session_id} abierta ({len(self.sessions)} activas).")
+        return session
+
+    def close_session(self, session, timeout=2.0):
+        # La fuente la cierra su propio hilo lector al salir: nunca se cierra con un read en curso
+        deadline = time.monotonic() + timeout
+        session.closed = True
+        interrupt = getattr(session.source, "interrupt", None)
+        if interrupt is not None:
+            interrupt()
+        session.reader.join(timeout)
+        if session.reader.is_alive():
+            logging.warning(f"La fuente de la sesión {session.session_id} no respondió al cierre.")
+        session.done.wait(max(0.0, deadline - time.monotonic()))
+
+    def _read_source(self, session):
+        try:
+            while not session.closed:
+                data = session.source.read(self.chunk_size, exception_on_overflow=False)
+                if data:
+                    session.feed(data)
+                elif getattr(session.source, "finished", False):
+                    break
+        except Exception as e:
+            logging.error(f"Error leyendo la fuente de la sesión {session.session_id}: {e}")
+        finally:
+            try:
+                session.source.close()
+            except Exception as e:
+                logging.error(f"Error cerrando la fuente de la sesión {session.session_id}: {e}")
+            session.end()
+
+    def enqueue(self, session, item, force=False):
+        with session.lock:
+            if len(session.pending) >= session.max_pending_chunks and not force:
+                # La sesión va retrasada: se descarta su audio más antiguo
+                session.pending.popleft()
+                session.dropped += 1
+            session.pending.append(item)
+            if session.scheduled:
+                return
+            session.scheduled = True
+        self._ready.put(session)
+
+    def _finish_session(self, session):
+        session.decoder.finish()
+        self._release_recognizer(session.recognizer)
+        with self._sessions_lock:
+            self.sessions.pop(session.session_id, None)
+        session.done.set()
+        logging.info(f"Sesión de voz {session.session_id} cerrada: {session.get_stats()}")
+
+    # --- Workers ---
+
+    def _worker(self):
+        while True:
+            session = self._ready.get()
+            if session is None:
+                break
+            finished = False
+            for _ in range(self.quantum):
+                with session.lock:
+                    if not session.pending:
+                        break
+                    enqueued, data = session.pending.popleft()
+                if data is END_OF_STREAM:
+                    finished = True
+                    break
+                session.lags.append(time.monotonic() - enqueued)
+                try:
+                    session.decode(data)
+                except Exception as e:
+                    logging.error(f"Error al decodificar en la sesión {session.session_id}: {e}")
+            if finished:
+                self._finish_session(session)
+                continue
+            with session.lock:
+                if not session.pending:
+                    session.scheduled = False
+                    continue
+            # Quedan chunks: vuelve al final de la cola para que otras sesiones tengan su turno
+            self._ready.put(session)
+
+    # --- Fuentes por socket ---
+
+    def serve_socket(self, address, **session_options):
+        # Acepta conexiones locales (ruta Unix o (host, puerto)); cada conexión es una sesión
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(address)
+        server.listen()
+        self._listener = server
+
+        def accept_loop():
+            while not self.closed:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    break
+                self.open_session(SocketSource(conn, rate=self.rate), **session_options)
+
+        threading.Thread(target=accept_loop, name="speech-listener", daemon=True).start()
+        logging.info(f"Escuchando audio en {address}.")
+        return server
+
+    # --- Estado ---
+
+    def get_stats(self):
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        return {
+            "sessions": len(sessions),
+            "workers": len(self._workers),
+            "idle_recognizers": len(self._idle_recognizers),
+            "ready_queue": self._ready.qsize(),
+            "per_session": [s.get_stats() for s in sessions],
+        }
+
+    def shutdown(self, timeout=2.0):
+        if self.closed:
+            return
+        self.closed = True
+        if self._listener is not None:
+            self._listener.close()
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            self.close_session(session, timeout)
+        for _ in self._workers:
+            self._ready.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
@@ -0,0 +1,79 @@
+# startup.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class Startup:
+    # Desglose del arranque: cada fase registra su duración y el instante en que terminó
+    def __init__(self, started=None, workers=3):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+        self.ready = threading.Event()
+        # Se activa si el usuario cierra antes de terminar el arranque: las fases pendientes no arrancan nada
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="startup")
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record(self, name, duration):
+        with self._lock:
+            self.phases[name] = duration
+            self.marks[name] = self.elapsed()
+
+    def mark(self, name):
+        # Hito sin duración propia (p. ej. primer frame): tiempo desde el inicio del proceso
+        with self._lock:
+            self.marks[name] = self.elapsed()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def submit(self, name, func, *args):
+        # Ejecuta una fase en segundo plano; devuelve un Future con su resultado
+        def run():
+            with self.phase(name):
+                return func(*args)
+        return self._executor.submit(run)
+
+    def mark_ready(self):
+        self.mark("listo")
+        self.ready.set()
+        logging.info(f"Sistema listo en {self.marks['listo'] * 1000:.0f} ms. Arranque: {self.summary()}")
+
+    def summary(self):
+        with self._lock:
+            phases = " ".join(f"{name}={duration * 1000:.0f}ms" for name, duration in self.phases.items())
+            marks = " ".join(f"{name}@{at * 1000:.0f}ms" for name, at in self.marks.items() if name not in self.phases)
+        return f"{phases} {marks}".strip()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "phases_ms": {name: round(d * 1000, 1) for name, d in self.phases.items()},
+                "marks_ms": {name: round(t * 1000, 1) for name, t in self.marks.items()},
+                "ready": self.ready.is_set(),
+            }
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Phase:
+    def __init__(self, startup, name):
+        self.startup = startup
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.startup.record(self.name, time.perf_counter() - self.start)
@@ -0,0 +1,162 @@
+# tx_scheduler.py
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from can_receptor import pgn_of
+from can_service import CanSenderService
+
+# PGN de solicitud (Request, PGN 59904): cada PGN solicitado es una trama distinta
+REQUEST_PGN = 0xEA00
+
+class PendingFrame:
+    def __init__(self, key, pgn, arbitration_id, data, due):
+        self.key = key
+        self.pgn = pgn
+        self.arbitration_id = arbitration_id
+        self.data = data
+        self.due = due
+        self.futures = []
+
+class TransmitScheduler:
+    # Delante de CanSenderService: agrupa cambios al mismo PGN y respeta un intervalo mínimo por PGN.
+    # Las tramas de estado se construyen con el estado completo, así que la última pendiente
+    # ya contiene todos los cambios (p. ej. luces de cabina y exteriores en una sola 0x18FEF157).
+    _schedulers = {}
+    _schedulers_lock = threading.Lock()
+
+    def __init__(self, service=None, coalesce_window=0.005, min_interval=0.05, pgn_intervals=None):
+        self.service = service if service is not None else CanSenderService.get()
+        self.coalesce_window = coalesce_window    # Espera mínima para recoger cambios simultáneos
+        self.min_interval = min_interval          # Separación mínima entre tramas del mismo PGN
+        self.pgn_intervals = dict(pgn_intervals or {})
+        self.pending = {}
+        self.last_sent = {}
+        self.closed = False
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0       # Tramas ahorradas al fusionarse con otra pendiente
+        self.rate_limited = 0    # Tramas retrasadas por el intervalo mínimo de su PGN
+        self._thread = threading.Thread(target=self._run, name="can-tx-scheduler", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls, interface='virtual', channel=None):
+        key = (interface, channel)
+        with cls._schedulers_lock:
+            scheduler = cls._schedulers.get(key)
+            if scheduler is None or scheduler.closed:
+                scheduler = cls(CanSenderService.get(interface, channel))
+                cls._schedulers[key] = scheduler
+            return scheduler
+
+    @classmethod
+    def shutdown_all(cls, timeout=2.0):
+        with cls._schedulers_lock:
+            schedulers = list(cls._schedulers.values())
+            cls._schedulers.clear()
+        for scheduler in schedulers:
+            scheduler.shutdown(timeout)
+
+    @staticmethod
+    def coalesce_key(arbitration_id, data):
+        if pgn_of(arbitration_id) == REQUEST_PGN:
+            # Solicitudes iguales se fusionan; solicitudes de PGN distintos no
+            return arbitration_id, bytes(data[:3])
+        return arbitration_id
+
+    def interval_for(self, pgn):
+        return self.pgn_intervals.get(pgn, self.min_interval)
+
+    def submit(self, arbitration_id, data):
+        # Mismo contrato que CanSenderService.submit: Future resuelto con el mensaje realmente enviado
+        future = Future()
+        key = self.coalesce_key(arbitration_id, data)
+        with self._cond:
+            if self.closed:
+                self.service.submit(arbitration_id, data).add_done_callback(lambda f: _copy_result(f, future))
+                return future
+            self.submitted += 1
+            frame = self.pending.get(key)
+            if frame is not None:
+                # Gana el contenido más reciente; todos los que esperaban reciben la misma trama
+                frame.data = data
+                frame.futures.append(future)
+                self.coalesced += 1
+                return future
+            pgn = pgn_of(arbitration_id)
+            now = time.monotonic()
+            due = now + self.coalesce_window
+            earliest = self.last_sent.get(pgn, float("-inf")) + self.interval_for(pgn)
+            if earliest > due:
+                due = earliest
+                self.rate_limited += 1
+            frame = PendingFrame(key, pgn, arbitration_id, data, due)
+            frame.futures.append(future)
+            self.pending[key] = frame
+            heapq.heappush(self._heap, (due, next(self._sequence), key))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        if self.closed:
+                            return
+                        self._cond.wait()
+                        continue
+                    due, _, key = self._heap[0]
+                    delay = due - time.monotonic()
+                    if delay > 0 and not self.closed:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    frame = self.pending.pop(key)
+                    self.last_sent[frame.pgn] = time.monotonic()
+                    self.sent += 1
+                    break
+            futures = frame.futures
+            self.service.submit(frame.arbitration_id, frame.data).add_done_callback(
+                lambda f, futures=futures: [_copy_result(f, target) for target in futures])
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "frames_saved": self.coalesced,
+                "rate_limited": self.rate_limited,
+                "pending": len(self.pending),
+            }
+
+    def shutdown(self, timeout=2.0):
+        # Envía lo pendiente sin esperar a sus plazos y detiene el hilo
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        logging.info(f"Planificador de transmisión detenido: {self.get_stats()}")
+
+def _copy_result(source, target):
+    # Un llamante que ya canceló su Future (p. ej. wait_for del runtime) se omite sin afectar a los demás
+    if source.cancelled():
+        target.cancel()
+    elif not target.set_running_or_notify_cancel():
+        return
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+atexit.register(TransmitScheduler.shutdown_all)
@@ -0,0 +1,55 @@
+# utterance_decoder.py
+import json
+import time
+
+class UtteranceDecoder:
+    # Bucle por chunk común a sesiones, evaluación por lotes y benchmarks: AGC -> VAD -> AcceptWaveform,
+    # con el resultado final forzado al terminar cada segmento de voz. SpeechRecognizer tiene el suyo
+    # porque además despacha desde resultados parciales.
+    def __init__(self, recognizer, gate=None, agc=None, on_text=None):
+        self.recognizer = recognizer
+        self.gate = gate          # VoiceActivityGate, o None para enviar todo el audio
+        self.agc = agc            # AutomaticGainControl, o None si el audio ya viene normalizado
+        self.on_text = on_text    # on_text(texto) por cada enunciado no vacío; si no, se acumulan en texts
+        self.texts = []
+        self.cpu = 0.0            # Tiempo de CPU dentro de Vosk (AcceptWaveform y FinalResult)
+
+    @staticmethod
+    def clean_text(result_json):
+        text = json.loads(result_json).get("text", "").replace("[unk]", " ").lower()
+        return " ".join(text.split())
+
+    def push(self, data):
+        if self.gate is None:
+            self.accept(data)
+            return
+        chunks, segment_ended = self.gate.push(data)
+        for chunk in chunks:
+            self.accept(chunk)
+        if segment_ended:
+            self.finish()
+
+    def accept(self, data):
+        if self.agc is not None:
+            data = self.agc.process(data)
+        start = time.thread_time()
+        accepted = self.recognizer.AcceptWaveform(data)
+        self.cpu += time.thread_time() - start
+        if accepted:
+            self.emit(self.recognizer.Result())
+
+    def finish(self):
+        # Cierra el enunciado en curso; también al agotarse el audio
+        start = time.thread_time()
+        result = self.recognizer.FinalResult()
+        self.cpu += time.thread_time() - start
+        self.emit(result)
+
+    def emit(self, result_json):
+        text = self.clean_text(result_json)
+        if not text:
+            return
+        if self.on_text is not None:
+            self.on_text(text)
+        else:
+            self.texts.append(text)
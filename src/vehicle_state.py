@@ -0,0 +1,69 @@
+# vehicle_state.py
+import queue
+import threading
+from types import MappingProxyType
+
+class VehicleStateStore:
+    def __init__(self, initial):
+        # (versión, instantánea inmutable); se reemplaza entera en cada cambio
+        self._current = (0, MappingProxyType(dict(initial)))
+        self._cond = threading.Condition()
+        self._subscribers = []
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def snapshot(self):
+        # Lectura sin bloqueo: una sola referencia a una tupla que nunca se modifica
+        return self._current
+
+    def get(self, key, default=None):
+        return self._current[1].get(key, default)
+
+    def update(self, changes):
+        # Devuelve la versión resultante; sólo se incrementa si algún valor cambia
+        with self._cond:
+            version, state = self._current
+            diff = {k: v for k, v in changes.items() if state.get(k) != v or k not in state}
+            if not diff:
+                return version
+            new_state = dict(state)
+            new_state.update(diff)
+            version += 1
+            self._current = (version, MappingProxyType(new_state))
+            self._cond.notify_all()
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._deliver(subscriber, (version, diff))
+        return version
+
+    def wait_for_change(self, since_version, timeout=None):
+        # Bloquea al consumidor (nunca al escritor) hasta que haya una versión más nueva
+        with self._cond:
+            self._cond.wait_for(lambda: self._current[0] > since_version, timeout)
+            return self._current
+
+    def subscribe(self, maxsize=64):
+        # Cola de cambios (versión, diff); si el consumidor se retrasa se descartan los más antiguos
+        subscriber = queue.Queue(maxsize=maxsize)
+        with self._cond:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._cond:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    @staticmethod
+    def _deliver(subscriber, item):
+        while True:
+            try:
+                subscriber.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
@@ -0,0 +1,88 @@
+# voice_activity.py
+import time
+import numpy as np
+
+class VoiceActivityDetector:
+    def __init__(self, energy_threshold=300.0, zcr_min=0.02, zcr_max=0.5,
+                 noise_adapt=0.05, noise_ratio=3.0):
+        self.energy_threshold = energy_threshold  # RMS mínimo absoluto para considerar voz
+        self.zcr_min = zcr_min                    # Tasa de cruces por cero aceptada para voz
+        self.zcr_max = zcr_max
+        self.noise_adapt = noise_adapt            # Adaptación del nivel de ruido de fondo
+        self.noise_ratio = noise_ratio            # Voz si supera el ruido de fondo por este factor
+        self.noise_floor = None
+        self._scratch = np.empty(0, dtype=np.float32)
+
+    def reset(self):
+        self.noise_floor = None
+
+    def measure(self, audio_data):
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        n = samples.shape[0]
+        if n < 2:
+            return 0.0, 0.0
+        if self._scratch.shape[0] < n:
+            self._scratch = np.empty(n, dtype=np.float32)
+        scratch = self._scratch[:n]
+        np.copyto(scratch, samples, casting='unsafe')
+        rms = float(np.sqrt(np.dot(scratch, scratch) / n))
+        signs = np.signbit(samples)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / (n - 1)
+        return rms, zcr
+
+    def is_speech(self, audio_data):
+        rms, zcr = self.measure(audio_data)
+        if self.noise_floor is None:
+            # Acotado por energy_threshold: si se empieza hablando, la voz no se toma por ruido de fondo
+            self.noise_floor = min(rms, self.energy_threshold)
+        threshold = max(self.energy_threshold, self.noise_floor * self.noise_ratio)
+        speech = rms >= threshold and self.zcr_min <= zcr <= self.zcr_max
+        if not speech:
+            # Sólo se adapta el ruido de fondo con tramos que no son voz
+            self.noise_floor += self.noise_adapt * (rms - self.noise_floor)
+        return speech
+
+
+class VoiceActivityGate:
+    def __init__(self, detector, preroll, hangover_chunks=8):
+        self.detector = detector
+        self.preroll = preroll                  # deque con maxlen: audio previo al inicio de voz
+        self.hangover_chunks = hangover_chunks  # Chunks que se siguen enviando tras la última voz
+        self.active = False
+        self.last_voice_time = None
+        self._hangover_left = 0
+
+        self.total_chunks = 0
+        self.passed_chunks = 0
+
+    @property
+    def skipped_fraction(self):
+        if not self.total_chunks:
+            return 0.0
+        return 1.0 - self.passed_chunks / self.total_chunks
+
+    def push(self, audio_data):
+        # Devuelve (chunks a enviar al reconocedor, fin de segmento de voz)
+        self.total_chunks += 1
+        if self.detector.is_speech(audio_data):
+            # Reloj de pared, comparable con las marcas de tiempo de python-can
+            self.last_voice_time = time.time()
+            chunks = []
+            if not self.active:
+                # Inicio de voz: enviar primero el pre-roll para no recortar la palabra clave
+                self.active = True
+                chunks.extend(self.preroll)
+                self.preroll.clear()
+            chunks.append(audio_data)
+            self._hangover_left = self.hangover_chunks
+            self.passed_chunks += len(chunks)
+            return chunks, False
+        if self.active:
+            self.passed_chunks += 1
+            self._hangover_left -= 1
+            if self._hangover_left <= 0:
+                self.active = False
+                return [audio_data], True
+            return [audio_data], False
+        self.preroll.append(audio_data)
+        return (), False
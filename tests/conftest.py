@@ -0,0 +1,37 @@
+# conftest.py
+import os
+import sys
+import wave
+import numpy as np
+import pytest
+
+# Los módulos de src/ se importan por nombre, igual que en main.py y en los benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+RATE = 16000
+CHUNK = 1024
+
+def tone(seconds, frequency=300.0, amplitude=6000, rate=RATE):
+    # Tono con armónicos: energía y cruces por cero en el rango de la voz
+    t = np.arange(int(seconds * rate)) / rate
+    signal = np.sin(2 * np.pi * frequency * t) + 0.3 * np.sin(2 * np.pi * 2 * frequency * t)
+    return (signal * amplitude / 1.3).astype(np.int16).tobytes()
+
+def silence(seconds, amplitude=40, rate=RATE, seed=0):
+    # Ruido de fondo de baja energía, no silencio digital exacto
+    noise = np.random.default_rng(seed).normal(0, amplitude, int(seconds * rate))
+    return noise.astype(np.int16).tobytes()
+
+def chunks(data, size=CHUNK):
+    return [data[i:i + size * 2] for i in range(0, len(data), size * 2)]
+
+@pytest.fixture
+def speech_wav(tmp_path):
+    # 0.5 s de ruido de fondo, 0.5 s de "voz" y 1 s de ruido de fondo
+    path = tmp_path / "comando.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(silence(0.5) + tone(0.5) + silence(1.0, seed=1))
+    return str(path)
@@ -0,0 +1,91 @@
+# test_voice_activity.py
+from collections import deque
+import numpy as np
+from audio_sources import WavFileStream
+from voice_activity import VoiceActivityDetector, VoiceActivityGate
+from conftest import CHUNK, chunks, silence, tone
+
+
+def make_gate(preroll_chunks=3, hangover_chunks=4):
+    return VoiceActivityGate(VoiceActivityDetector(), deque(maxlen=preroll_chunks), hangover_chunks=hangover_chunks)
+
+
+def test_detector_separates_speech_from_background_noise():
+    detector = VoiceActivityDetector()
+    assert not any(detector.is_speech(chunk) for chunk in chunks(silence(0.5)))
+    assert all(detector.is_speech(chunk) for chunk in chunks(tone(0.5)))
+
+
+def test_detector_detects_speech_from_first_chunk():
+    detector = VoiceActivityDetector()
+    # El conductor ya está hablando cuando arranca la captura: no hay ruido previo con el que calibrar
+    assert all(detector.is_speech(chunk) for chunk in chunks(tone(0.5, amplitude=12000)))
+    assert not any(detector.is_speech(chunk) for chunk in chunks(silence(0.5)))
+
+
+def test_detector_rejects_loud_signal_outside_voice_zcr():
+    detector = VoiceActivityDetector()
+    # Alterna de signo en cada muestra: mucha energía pero ZCR = 1
+    buzz = np.tile(np.array([8000, -8000], dtype=np.int16), CHUNK // 2).tobytes()
+    assert not detector.is_speech(buzz)
+
+
+def test_detector_noise_floor_raises_threshold():
+    detector = VoiceActivityDetector(noise_adapt=1.0)
+    for chunk in chunks(silence(0.5, amplitude=2000)):
+        detector.is_speech(chunk)
+    # Un tono algo más fuerte que el ruido, pero por debajo de noise_ratio veces su nivel, no es voz
+    assert not detector.is_speech(chunks(tone(0.1, amplitude=3000))[0])
+
+
+def test_gate_skips_silence_and_keeps_preroll():
+    gate = make_gate(preroll_chunks=3)
+    background = chunks(silence(0.5))
+    for chunk in background:
+        assert gate.push(chunk) == ((), False)
+    assert list(gate.preroll) == background[-3:]
+
+    speech = chunks(tone(0.2))
+    passed, ended = gate.push(speech[0])
+    # Inicio de voz: primero el pre-roll, luego el chunk con voz
+    assert passed == background[-3:] + [speech[0]]
+    assert not ended
+    assert len(gate.preroll) == 0
+    assert gate.active
+
+
+def test_gate_hangover_then_segment_end():
+    gate = make_gate(preroll_chunks=2, hangover_chunks=4)
+    gate.push(chunks(silence(0.2))[0])
+    for chunk in chunks(tone(0.2)):
+        gate.push(chunk)
+
+    tail = chunks(silence(0.5, seed=2))
+    results = [gate.push(chunk) for chunk in tail]
+    # Se siguen enviando hangover_chunks chunks; el último cierra el segmento
+    assert [len(passed) for passed, _ in results[:4]] == [1, 1, 1, 1]
+    assert [ended for _, ended in results[:4]] == [False, False, False, True]
+    assert all(passed == () and not ended for passed, ended in results[4:])
+    assert not gate.active
+
+
+def test_gate_on_wav_fixture(speech_wav):
+    stream = WavFileStream(speech_wav, realtime=False, trailing_silence=0.0)
+    gate = make_gate(preroll_chunks=4, hangover_chunks=8)
+    passed_chunks = 0
+    segment_ends = 0
+    while True:
+        data = stream.read(CHUNK)
+        if not data:
+            break
+        passed, ended = gate.push(data)
+        passed_chunks += len(passed)
+        segment_ends += ended
+
+    speech_chunks = int(0.5 * 16000 / CHUNK)
+    assert segment_ends == 1
+    # Voz + pre-roll + hangover, con margen por los chunks de transición
+    assert speech_chunks + 4 + 8 - 2 <= passed_chunks <= speech_chunks + 4 + 8 + 2
+    assert gate.passed_chunks == passed_chunks
+    assert gate.skipped_fraction > 0.3
+    assert gate.last_voice_time is not None